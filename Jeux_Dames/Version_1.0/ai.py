@@ -0,0 +1,733 @@
+"""
+Computer player for the draughts game.
+
+Iterative-deepening alpha-beta (negamax) over Position.moves, with a
+fixed-size Zobrist-hashed transposition table, killer/history move
+ordering, principal variation search and late move reductions. The
+search stops when its time budget runs out and plays the best move of
+the last completed depth: depth 9 from the opening in the default second.
+
+EngineWorker runs the search in a separate process so that the pygame
+loop never waits for it. ParallelSearch spreads the root moves of each
+iteration over a pool of processes that share one transposition table in
+shared memory, for the hints of the GUI and analysis.
+
+With an OpeningBook, known opening positions are answered from the book
+without searching. With a Tablebase, the root keeps only the moves that
+preserve its endgame value, and nodes whose material changed since the
+root are scored from the tables.
+"""
+
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+from multiprocessing import shared_memory
+
+from book import open_book
+from tablebase import WIN, LOSS, DRAW, open_tablebase
+
+from position import (Position, GREY, BLUE, BIT, ROWS, ROW_MASK, COORDS, PROMOTION_ROW,
+                      ZOBRIST, ZOBRIST_BLUE_TO_MOVE, squares_of, other)
+
+PAWN_VALUE = 100
+KING_VALUE = 300
+ADVANCE_BONUS = 3   # per row a pawn has advanced
+CENTER_BONUS = 6    # per piece on the central squares
+BACK_RANK_BONUS = 8  # per pawn still guarding its own first row
+
+# Evaluation weights, in the order expected by evaluate()
+WEIGHT_NAMES = ('pawn', 'king', 'advance', 'center', 'back')
+DEFAULT_WEIGHTS = (PAWN_VALUE, KING_VALUE, ADVANCE_BONUS, CENTER_BONUS, BACK_RANK_BONUS)
+
+MATE = 100000
+INFINITY = 1000000
+TABLEBASE_WIN = MATE - 2000  # Below the mate scores, above any evaluation
+
+# Transposition table bound types
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# Late move reductions: quiet moves after the first LMR_MOVES ones are
+# searched LMR_DEPTH plies less deep, from LMR_MIN_DEPTH remaining plies on
+LMR_MOVES = 3
+LMR_MIN_DEPTH = 3
+LMR_DEPTH = 1
+
+CENTER_MASK = sum(BIT[sq] for sq, (row, col) in enumerate(COORDS) if 3 <= row <= 6 and 2 <= col <= 7)
+BACK_RANK = {GREY: ROW_MASK[ROWS - 1], BLUE: ROW_MASK[0]}
+
+
+def evaluate(position, color, weights=DEFAULT_WEIGHTS):
+    """Static score of the position, from the point of view of color."""
+    pawn_value, king_value, advance_bonus, center_bonus, back_rank_bonus = weights
+    grey, blue, kings = position.grey, position.blue, position.kings
+    grey_pawns = grey & ~kings
+    blue_pawns = blue & ~kings
+
+    score = (pawn_value * (grey_pawns.bit_count() - blue_pawns.bit_count())
+             + king_value * ((grey & kings).bit_count() - (blue & kings).bit_count()))
+
+    # Pawns closer to promotion are worth more (grey moves up, blue down)
+    advance = 0
+    for row in range(1, ROWS - 1):
+        mask = ROW_MASK[row]
+        advance += (grey_pawns & mask).bit_count() * (ROWS - 1 - row) - (blue_pawns & mask).bit_count() * row
+    score += advance_bonus * advance
+
+    score += center_bonus * ((grey & CENTER_MASK).bit_count() - (blue & CENTER_MASK).bit_count())
+    back_rank = (grey_pawns & BACK_RANK[GREY]).bit_count() - (blue_pawns & BACK_RANK[BLUE]).bit_count()
+    score += back_rank_bonus * back_rank
+    return score if color == GREY else -score
+
+
+def move_key(position, from_sq, to_sq, captured):
+    """Zobrist delta of playing a move (includes the side-to-move switch)."""
+    kind = position.piece_kind(from_sq)
+    key = ZOBRIST[kind][from_sq] ^ ZOBRIST_BLUE_TO_MOVE
+    if not kind & 1 and to_sq // 5 == PROMOTION_ROW[GREY if kind == 0 else BLUE]:
+        key ^= ZOBRIST[kind | 1][to_sq]
+    else:
+        key ^= ZOBRIST[kind][to_sq]
+    for sq in squares_of(captured):
+        key ^= ZOBRIST[position.piece_kind(sq)][sq]
+    return key
+
+
+class TranspositionTable:
+    """
+    Fixed-size table indexed by the low bits of the Zobrist key.
+
+    A slot is replaced when it is empty, holds the same position, comes from
+    an earlier search, or was searched less deep than the new entry.
+    """
+
+    def __init__(self, size_bits=18):
+        self.mask = (1 << size_bits) - 1
+        self.slots = [None] * (self.mask + 1)
+        self.generation = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def clear(self):
+        self.slots = [None] * (self.mask + 1)
+
+    def get(self, key):
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, score, flag, move):
+        index = key & self.mask
+        old = self.slots[index]
+        if old is None or old[0] == key or old[5] != self.generation or depth >= old[1]:
+            self.slots[index] = (key, depth, score, flag, move, self.generation)
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    TranspositionTable in shared memory, for the processes of a
+    ParallelSearch.
+
+    An entry is three 64-bit words written without any lock: check, data
+    (score, depth, flag, move squares, generation) and the captured mask of
+    the move, with check = key ^ data ^ captured. An entry torn by two
+    processes writing the same slot at once fails the check and reads as
+    missing (lockless hashing).
+    """
+
+    _SCORE_OFFSET = 1 << 19
+    _DEPTH_OFFSET = 128  # Depth goes below 0 while captures are followed
+
+    def __init__(self, size_bits=20, name=None):
+        """Create a table, or attach to the table called name."""
+        self.mask = (1 << size_bits) - 1
+        size = 24 * (self.mask + 1)
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.words = self.memory.buf[:size].cast('Q')
+        self.generation = 0
+        if name is None:
+            self.clear()
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def clear(self):
+        self.memory.buf[:len(self.words) * 8] = bytes(len(self.words) * 8)
+
+    def get(self, key):
+        index = 3 * (key & self.mask)
+        words = self.words
+        data, captured = words[index + 1], words[index + 2]
+        if words[index] ^ data ^ captured != key:
+            return None
+        return (key, (data >> 20 & 0xff) - self._DEPTH_OFFSET, (data & 0xfffff) - self._SCORE_OFFSET,
+                data >> 28 & 3, (data >> 30 & 63, data >> 36 & 63, captured), data >> 42 & 0xff)
+
+    def store(self, key, depth, score, flag, move):
+        index = 3 * (key & self.mask)
+        words = self.words
+        old_data = words[index + 1]
+        old_key = words[index] ^ old_data ^ words[index + 2]
+        generation = self.generation & 0xff
+        if (old_data and old_key != key and old_data >> 42 & 0xff == generation
+                and depth < (old_data >> 20 & 0xff) - self._DEPTH_OFFSET):
+            return
+        from_sq, to_sq, captured = move
+        data = (score + self._SCORE_OFFSET | (depth + self._DEPTH_OFFSET) << 20 | flag << 28
+                | from_sq << 30 | to_sq << 36 | generation << 42)
+        words[index + 1] = data
+        words[index + 2] = captured
+        words[index] = key ^ data ^ captured
+
+    def close(self):
+        self.words.release()
+        self.memory.close()
+
+    def unlink(self):
+        self.memory.unlink()
+
+
+class _Timeout(Exception):
+    pass
+
+
+class Engine:
+    """Alpha-beta computer player"""
+
+    def __init__(self, time_limit=1.0, max_depth=64, tt_bits=18, stop_event=None,
+                 weights=DEFAULT_WEIGHTS, book=None, tablebase=None, tt=None):
+        self.time_limit = time_limit
+        self.weights = weights
+        self.book = book  # OpeningBook consulted before searching, or None
+        self.tablebase = tablebase  # Tablebase probed in endgames, or None
+        self._root_material = None
+        self._rng = random.Random()
+        self.stop_event = stop_event  # When set, the search returns at once
+        self.max_depth = max_depth
+        self.tt = tt if tt is not None else TranspositionTable(tt_bits)
+        self.nodes = 0
+        self.depth_reached = 0
+        self._deadline = 0.0
+        self._killers = []
+        self._history = {}
+
+    def search(self, position, color):
+        """
+        Find the best move for color.
+
+        Returns:
+            (move, score, depth): move is (from_sq, to_sq, captured_mask),
+            or None when color has no legal move.
+        """
+        start = time.perf_counter()
+        self._deadline = start + self.time_limit
+        self.nodes = 0
+        self.depth_reached = 0
+        self._reset_ordering()
+        self.tt.new_search()
+
+        moves = position.moves(color)
+        if not moves:
+            return None, -MATE, 0
+        if len(moves) == 1:
+            return moves[0], 0, 0
+        if self.book is not None:
+            move = self.book.choose(position, color, self._rng)
+            if move is not None:
+                return move, 0, 0
+        if self.tablebase is not None:
+            moves = self._tablebase_moves(position, color, moves)
+            if len(moves) == 1:
+                return moves[0], 0, 0
+        self._root_material = (position.grey | position.blue).bit_count(), position.kings.bit_count()
+
+        key = position.zobrist(color)
+        saved = len(position.undo)
+        best_move, best_score = moves[0], -INFINITY
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score, move = self._root(position, color, key, moves, depth, best_move)
+            except _Timeout:
+                # Take back the moves the interrupted search left on the board
+                while len(position.undo) > saved:
+                    position.unmake_move()
+                break
+            best_move, best_score = move, score
+            self.depth_reached = depth
+            # A mate was found, or the next depth would not finish in time
+            if abs(score) >= MATE - 1000 or time.perf_counter() - start > self.time_limit / 2:
+                break
+        return best_move, best_score, self.depth_reached
+
+    def _reset_ordering(self):
+        self._killers = [[None, None] for _ in range(self.max_depth + 64)]
+        self._history = {}
+
+    def _tablebase_moves(self, position, color, moves):
+        """The moves keeping the endgame value of the root, if it is in the tables."""
+        value = self.tablebase.probe(position, color)
+        if value not in (WIN, DRAW):
+            return moves
+        keep = []
+        for move in moves:
+            position.make_move(*move)
+            child = self.tablebase.probe(position, other(color))
+            position.unmake_move()
+            if child == LOSS or value == DRAW and child == DRAW:
+                keep.append(move)
+        return keep or moves
+
+    def _root(self, position, color, key, moves, depth, previous_best):
+        # Search the best move of the previous iteration first
+        moves = sorted(moves, key=lambda move: move != previous_best)
+        alpha = -INFINITY
+        best_move = moves[0]
+        next_color = other(color)
+        for move in moves:
+            child_key = key ^ move_key(position, *move)
+            position.make_move(*move)
+            score = -self._negamax(position, next_color, child_key, depth - 1, -INFINITY, -alpha, 1)
+            position.unmake_move()
+            if score > alpha:
+                alpha = score
+                best_move = move
+        self.tt.store(key, depth, alpha, EXACT, best_move)
+        return alpha, best_move
+
+    def _negamax(self, position, color, key, depth, alpha, beta, ply):
+        self.nodes += 1
+        if not self.nodes & 1023 and (time.perf_counter() > self._deadline or
+                                      self.stop_event is not None and self.stop_event.is_set()):
+            raise _Timeout
+
+        tablebase = self.tablebase
+        if tablebase is not None:
+            # Only after a capture or a promotion: inside the root's own
+            # material the tables say nothing about making progress
+            pieces = (position.grey | position.blue).bit_count()
+            if (pieces <= tablebase.max_pieces and
+                    (pieces, position.kings.bit_count()) != self._root_material):
+                value = tablebase.probe(position, color)
+                if value == WIN:
+                    return TABLEBASE_WIN - ply
+                if value == LOSS:
+                    return ply - TABLEBASE_WIN
+                if value == DRAW:
+                    return 0
+
+        moves = position.moves(color)
+        if not moves:
+            return -MATE + ply
+        capture = moves[0][2] != 0
+        # Captures are forced, so the position is only quiet without them
+        if depth <= 0 and not capture:
+            return evaluate(position, color, self.weights)
+
+        original_alpha = alpha
+        tt_move = None
+        entry = self.tt.get(key)
+        if entry is not None:
+            tt_move = entry[4]
+            if entry[1] >= depth:
+                score = _score_from_tt(entry[2], ply)
+                flag = entry[3]
+                if flag == EXACT:
+                    return score
+                if flag == LOWER and score > alpha:
+                    alpha = score
+                elif flag == UPPER and score < beta:
+                    beta = score
+                if alpha >= beta:
+                    return score
+
+        if len(moves) > 1:
+            moves.sort(key=self._ordering(tt_move, ply), reverse=True)
+
+        best_score = -INFINITY
+        best_move = moves[0]
+        next_color = other(color)
+        killers = self._killers[ply]
+        reduce = not capture and depth >= LMR_MIN_DEPTH
+        for index, move in enumerate(moves):
+            child_key = key ^ move_key(position, *move)
+            position.make_move(*move)
+            if index == 0:
+                score = -self._negamax(position, next_color, child_key, depth - 1, -beta, -alpha, ply + 1)
+            else:
+                # Principal variation search: the later moves only have to
+                # be shown worse than alpha, with a null window, at reduced
+                # depth for the late quiet ones; re-searched if they are not
+                new_depth = depth - 1
+                if reduce and index >= LMR_MOVES and move != tt_move and move not in killers:
+                    new_depth -= LMR_DEPTH
+                score = -self._negamax(position, next_color, child_key, new_depth, -alpha - 1, -alpha, ply + 1)
+                if score > alpha and new_depth < depth - 1:
+                    score = -self._negamax(position, next_color, child_key, depth - 1, -alpha - 1, -alpha, ply + 1)
+                if alpha < score < beta:
+                    score = -self._negamax(position, next_color, child_key, depth - 1, -beta, -alpha, ply + 1)
+            position.unmake_move()
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if not capture:
+                            self._remember_cutoff(move, depth, ply)
+                        break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.store(key, depth, _score_to_tt(best_score, ply), flag, best_move)
+        return best_score
+
+    def _ordering(self, tt_move, ply):
+        killers = self._killers[ply]
+        history = self._history
+
+        def priority(move):
+            if move == tt_move:
+                return 1 << 30
+            if move == killers[0]:
+                return 1 << 28
+            if move == killers[1]:
+                return 1 << 27
+            return history.get((move[0], move[1]), 0)
+        return priority
+
+    def _remember_cutoff(self, move, depth, ply):
+        killers = self._killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        key = (move[0], move[1])
+        self._history[key] = self._history.get(key, 0) + depth * depth
+
+
+class EngineWorker:
+    """
+    Runs Engine.search in a background process.
+
+    The GUI sends a request with request() and checks poll() once per frame;
+    neither call blocks. cancel() stops the current search and drops its
+    answer.
+    """
+
+    def __init__(self, time_limit=1.0, book_path=None, tablebase_dir=None):
+        # spawn: the child must not inherit the parent's SDL state
+        context = multiprocessing.get_context('spawn')
+        self.requests = context.Queue()
+        self.responses = context.Queue()
+        # Id of the request the GUI still waits for (0: none). A search whose
+        # id no longer matches stops at once.
+        self.current = context.Value('q', 0, lock=False)
+        self.process = context.Process(target=_worker_loop, daemon=True,
+                                       args=(self.requests, self.responses, self.current, time_limit,
+                                             book_path, tablebase_dir))
+        self.process.start()
+        self.pending = None
+        self._next_id = 0
+        self.last_result = None  # (score, depth, nodes) of the last answer
+
+    @property
+    def thinking(self):
+        return self.pending is not None
+
+    def request(self, position, color):
+        """Ask for the best move of color in position (a Position)."""
+        self._next_id += 1
+        self.pending = self._next_id
+        self.current.value = self.pending
+        self.requests.put((self.pending, position, color))
+
+    def poll(self):
+        """
+        Non-blocking check for the answer to the pending request.
+
+        Returns:
+            (done, move): done is False while the engine is still thinking;
+            move is None when the side has no legal move.
+        """
+        while self.pending is not None:
+            try:
+                request_id, move, score, depth, nodes = self.responses.get_nowait()
+            except queue.Empty:
+                return False, None
+            if request_id == self.pending:
+                self.pending = None
+                self.last_result = (score, depth, nodes)
+                return True, move
+        return False, None
+
+    def played(self, move):
+        """Called with the moves of the other player; the engine searches
+        from the position given to request(), so there is nothing to do."""
+
+    def cancel(self):
+        if self.pending is not None:
+            self.pending = None
+            self.current.value = 0
+
+    def close(self):
+        self.cancel()
+        self.requests.put(None)
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class _RequestWatch:
+    """Event-like stop flag, set once the GUI no longer waits for request_id."""
+
+    def __init__(self, current, request_id):
+        self.current = current
+        self.request_id = request_id
+
+    def is_set(self):
+        return self.current.value != self.request_id
+
+
+def _worker_loop(requests, responses, current, time_limit, book_path, tablebase_dir):
+    # Each worker maps the book file; the pages are shared between processes
+    tablebase = open_tablebase(tablebase_dir) if tablebase_dir else None
+    engine = Engine(time_limit=time_limit, book=open_book(book_path), tablebase=tablebase)
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, position, color = request
+        engine.stop_event = _RequestWatch(current, request_id)
+        move, score, depth = engine.search(position, color)
+        responses.put((request_id, move, score, depth, engine.nodes))
+
+
+class ParallelSearch:
+    """
+    Iterative deepening with the root moves searched on a pool of processes.
+
+    Every process keeps its own Engine, but they all share one
+    SharedTranspositionTable, so what one learns about a position is used
+    by the others and by the next iteration. At each depth the best move
+    of the previous iteration is searched with a full window while the
+    other moves are tested at the same time with a null window around the
+    previous score; a move is searched again, with the window given by the
+    first move, only when that test does not prove it worse.
+
+    With book_path, known opening positions are answered from the opening
+    book (its most played move) without searching, as the Engine does.
+
+    search() blocks. request(), poll() and cancel() run it on a thread of
+    the calling process, with the interface of EngineWorker, for the GUI.
+    """
+
+    def __init__(self, processes=None, time_limit=2.0, max_depth=64, tt_bits=20, weights=DEFAULT_WEIGHTS,
+                 book_path=None):
+        self.processes = processes or os.cpu_count()
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.table = SharedTranspositionTable(tt_bits)
+        self.book = open_book(book_path)  # OpeningBook, or None
+        # spawn: the children must not inherit the parent's SDL state
+        context = multiprocessing.get_context('spawn')
+        # Id of the running search (0: none); tasks of another search stop at once
+        self.current = context.Value('q', 0, lock=False)
+        self.pool = context.Pool(self.processes, initializer=_init_search_process,
+                                 initargs=(self.table.name, tt_bits, self.current, max_depth, weights))
+        self.nodes = 0
+        self.depth_reached = 0
+        self.pending = None  # Id of the request() whose answer poll() waits for
+        self._answer = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def search(self, position, color, max_depth=None, time_limit=None):
+        """
+        Find the best move for color, like Engine.search.
+
+        Returns:
+            (move, score, depth): move is None when color has no legal move.
+        """
+        time_limit = self.time_limit if time_limit is None else time_limit
+        max_depth = self.max_depth if max_depth is None else max_depth
+        start = time.perf_counter()
+        deadline = start + time_limit
+        self.nodes = 0
+        self.depth_reached = 0
+        moves = position.moves(color)
+        if not moves:
+            return None, -MATE, 0
+        if len(moves) == 1:
+            return moves[0], 0, 0
+        if self.book is not None:
+            move = self.book.choose(position, color)
+            if move is not None:
+                return move, 0, 0
+
+        with self._lock:
+            self._next_id += 1
+            search_id = self._next_id
+            self.current.value = search_id
+        self.table.new_search()
+        masks = (position.grey, position.blue, position.kings)
+
+        def submit(move, depth, alpha, beta):
+            task = (search_id, self.table.generation, masks, color, move, depth, alpha, beta,
+                    deadline - time.perf_counter())
+            return self.pool.apply_async(_search_root_move, (task,))
+
+        best_move, best_score = moves[0], None
+        for depth in range(1, max_depth + 1):
+            result = self._iteration(submit, moves, best_move, depth, best_score)
+            if result is None:
+                break  # Out of time or cancelled: keep the last complete depth
+            best_move, best_score = result
+            self.depth_reached = depth
+            if abs(best_score) >= MATE - 1000 or time.perf_counter() - start > time_limit / 2:
+                break
+        with self._lock:
+            # Tasks still queued or running for this search stop at once
+            if self.current.value == search_id:
+                self.current.value = 0
+        return best_move, best_score or 0, self.depth_reached
+
+    def _iteration(self, submit, moves, first_move, depth, guess):
+        """(best move, score) at one depth, or None if it did not finish."""
+        others = [move for move in moves if move != first_move]
+        first = submit(first_move, depth, -INFINITY, INFINITY)
+        tests = []
+        if guess is not None:
+            # Meanwhile, test the other moves against the previous score
+            tests = [(move, submit(move, depth, guess, guess + 1)) for move in others]
+        alpha = self._collect(first)
+        if alpha is None:
+            return None
+        if guess is None:
+            guess = alpha
+            tests = [(move, submit(move, depth, alpha, alpha + 1)) for move in others]
+
+        retries = []
+        for move, result in tests:
+            score = self._collect(result)
+            if score is None:
+                return None
+            # Proven worse only by an upper bound (score <= guess) below alpha
+            if score > guess or score > alpha:
+                retries.append((move, submit(move, depth, alpha, INFINITY)))
+
+        best_move, best_score = first_move, alpha
+        for move, result in retries:
+            score = self._collect(result)
+            if score is None:
+                return None
+            if score > best_score:
+                best_move, best_score = move, score
+        return best_move, best_score
+
+    def _collect(self, result):
+        score, nodes = result.get()
+        self.nodes += nodes
+        return score
+
+    @property
+    def thinking(self):
+        return self.pending is not None
+
+    def request(self, position, color):
+        """Start searching the best move of color on a background thread."""
+        self.cancel()
+        self._answer = None
+        request_id = self.pending = object()
+        threading.Thread(target=self._run, args=(request_id, position.copy(), color), daemon=True).start()
+
+    def _run(self, request_id, position, color):
+        move, score, depth = self.search(position, color)
+        if self.pending is request_id:
+            self._answer = (request_id, move)
+
+    def poll(self):
+        """Non-blocking check for the answer to the pending request, like EngineWorker.poll."""
+        answer = self._answer
+        if self.pending is None or answer is None or answer[0] is not self.pending:
+            return False, None
+        self.pending = None
+        self._answer = None
+        return True, answer[1]
+
+    def cancel(self):
+        if self.pending is not None:
+            self.pending = None
+            with self._lock:
+                self.current.value = 0
+
+    def close(self):
+        self.cancel()
+        self.pool.terminate()
+        self.pool.join()
+        self.table.close()
+        self.table.unlink()
+        if self.book is not None:
+            self.book.close()
+
+
+_search_engine = None  # Engine of a ParallelSearch pool process
+
+
+def _init_search_process(table_name, tt_bits, current, max_depth, weights):
+    global _search_engine
+    table = SharedTranspositionTable(tt_bits, table_name)
+    _search_engine = Engine(time_limit=0, max_depth=max_depth, weights=weights, tt=table,
+                            stop_event=_RequestWatch(current, 0))
+
+
+def _search_root_move(task):
+    """
+    Score of one root move for the side playing it, and the nodes searched.
+    The score is None when the search ran out of time or was cancelled.
+    """
+    search_id, generation, masks, color, move, depth, alpha, beta, time_left = task
+    engine = _search_engine
+    if engine.stop_event.request_id != search_id:
+        engine.stop_event.request_id = search_id
+        engine._reset_ordering()
+    if engine.stop_event.is_set():
+        return None, 0
+    engine.tt.generation = generation
+    engine._deadline = time.perf_counter() + time_left
+    position = Position(*masks)
+    key = position.zobrist(color) ^ move_key(position, *move)
+    position.make_move(*move)
+    nodes = engine.nodes
+    try:
+        score = -engine._negamax(position, other(color), key, depth - 1, -beta, -alpha, 1)
+    except _Timeout:
+        score = None
+    return score, engine.nodes - nodes
+
+
+def _score_to_tt(score, ply):
+    # Mate scores are stored relative to the node, not to the root
+    if score >= MATE - 1000:
+        return score + ply
+    if score <= -MATE + 1000:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score, ply):
+    if score >= MATE - 1000:
+        return score - ply
+    if score <= -MATE + 1000:
+        return score + ply
+    return score
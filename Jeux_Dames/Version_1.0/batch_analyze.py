@@ -0,0 +1,127 @@
+"""
+Batch analysis of positions: JSON Lines in, JSON Lines out.
+
+Every input line is a position in FEN (see pdn.parse_fen), either as a
+JSON string or as an object with a "fen" field; the other fields of an
+object are copied to the output, so an id from the logs follows its
+position. Each output line adds:
+    "moves"     legal moves of the side to move, in PDN notation
+    "captures"  pieces taken by the forced capture (0 without capture)
+    "winner"    "GRIS", "BLEU" or null, as Board.winner: a side without
+                pieces or without legal move (side to move) loses
+A line that cannot be read gives {"line": n, "error": "..."} instead.
+Output lines are in the order of the input.
+
+Lines are read and written in chunks, so memory stays bounded whatever
+the size of the input. With --jobs N the chunks are analysed by N
+processes, with at most a few chunks per process in flight.
+
+Usage:
+    python batch_analyze.py < positions.jsonl > analysis.jsonl
+    echo '"W:W31-50:B1-20"' | python batch_analyze.py
+    python batch_analyze.py --jobs 4 --chunk 2000 < positions.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+
+import pdn
+import rules
+
+# Chunks queued per process: enough to keep them busy, few enough to bound memory
+CHUNKS_IN_FLIGHT = 4
+
+
+def analyze(fen):
+    """Legal moves, forced capture size and winner of a FEN position."""
+    position, color = pdn.parse_fen(fen)
+    moves = position.moves(color)
+    return {
+        "moves": [pdn.move_text(*move) for move in moves],
+        "captures": bin(moves[0][2]).count("1") if moves else 0,
+        "winner": rules.winner(position, color, moves),
+    }
+
+
+def analyze_line(number, line):
+    """Output line (without the newline) of input line number."""
+    try:
+        record = json.loads(line)
+        if isinstance(record, str):
+            record = {"fen": record}
+        record.update(analyze(record["fen"]))
+    except (ValueError, KeyError, TypeError, AttributeError) as error:
+        record = {"line": number, "error": str(error) or type(error).__name__}
+    return json.dumps(record, separators=(",", ":"))
+
+
+def analyze_chunk(chunk):
+    """Output text of a chunk (first line number, lines)."""
+    first, lines = chunk
+    return "".join(analyze_line(number, line) + "\n"
+                   for number, line in enumerate(lines, first) if line.strip())
+
+
+def chunks(lines, size):
+    """(first line number, lines) of size lines at a time."""
+    number = 1
+    lines = iter(lines)
+    while True:
+        chunk = list(itertools.islice(lines, size))
+        if not chunk:
+            return
+        yield number, chunk
+        number += len(chunk)
+
+
+def analyze_parallel(chunked, jobs):
+    """Output text of every chunk, in order, analysed by a pool of jobs processes."""
+    with multiprocessing.Pool(jobs) as pool:
+        # Pool.imap would read the whole input ahead: submit a bounded window instead
+        pending = deque()
+        for chunk in chunked:
+            pending.append(pool.apply_async(analyze_chunk, (chunk,)))
+            if len(pending) >= jobs * CHUNKS_IN_FLIGHT:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def run(source, output, chunk=1000, jobs=1):
+    """Analyse every line of source, write to output; returns the number of lines read."""
+    read = 0
+
+    def counted():
+        nonlocal read
+        for first, lines in chunks(source, chunk):
+            read += len(lines)
+            yield first, lines
+
+    results = analyze_parallel(counted(), jobs) if jobs > 1 else map(analyze_chunk, counted())
+    for text in results:
+        output.write(text)
+    return read
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse de positions FEN en JSON Lines (entree standard)")
+    parser.add_argument("--jobs", type=int, default=1, help="processus d'analyse")
+    parser.add_argument("--chunk", type=int, default=1000, help="lignes par lot")
+    parser.add_argument("--stats", action="store_true", help="debit sur la sortie d'erreur")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    lines = run(sys.stdin, sys.stdout, max(1, args.chunk), max(1, args.jobs))
+    sys.stdout.flush()
+    if args.stats:
+        elapsed = time.perf_counter() - start
+        print(f"{lines} lignes en {elapsed:.2f}s, {lines / max(elapsed, 1e-9):.0f} lignes/s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+Evaluation of many positions at once with NumPy, for parameter tuning.
+
+Positions are encoded as an (N, 3) uint64 array of (grey, blue, kings)
+masks plus the side to move. Every feature is computed for the whole
+array at once with bitwise operations and population counts on those
+masks, instead of one Python call per position.
+
+Features, from grey's point of view (FEATURE_NAMES):
+    pawn, king, advance, center, back - the terms of ai.evaluate
+                 (advance is the tempo count of draughts: rows advanced by
+                 the pawns)
+    mobility - simple moves of grey minus simple moves of blue, queens
+               counting every free square of their diagonals; captures are
+               not looked at
+
+evaluate_batch with the default weights (mobility 0) returns
+exactly ai.evaluate(position, side to move) for every position.
+
+Usage:
+    python batch_eval.py -n 200000
+    python batch_eval.py --pdn parties.pdn
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+import pdn
+from ai import DEFAULT_WEIGHTS, WEIGHT_NAMES, CENTER_MASK, evaluate
+from position import Position, GREY, BLUE, BIT, RAYS, FORWARD, ROWS, NUM_SQUARES, other
+
+FEATURE_NAMES = WEIGHT_NAMES + ('mobility',)
+DEFAULT_BATCH_WEIGHTS = DEFAULT_WEIGHTS + (0,)
+
+CHUNK = 8192  # Positions per step, bounds the size of temporary arrays
+
+_U64 = np.uint64
+
+
+def _mask(squares):
+    return _U64(sum(BIT[sq] for sq in squares))
+
+
+# (grey bonus, blue bonus, row mask) for the rows a pawn can advance through
+_ADVANCE = [(ROWS - 1 - row, row, _mask(range(row * 5, row * 5 + 5))) for row in range(1, ROWS - 1)]
+_CENTER = _U64(CENTER_MASK)
+_BACK = {GREY: _mask(range(NUM_SQUARES - 5, NUM_SQUARES)), BLUE: _mask(range(5))}
+
+# One-step moves on the bitmasks: the square index delta of a step depends on
+# the row parity, so each direction is a few (delta, source squares) pairs
+_STEPS = []
+for _direction in range(4):
+    _deltas = {}
+    for _sq in range(NUM_SQUARES):
+        if RAYS[_sq][_direction]:
+            _deltas.setdefault(RAYS[_sq][_direction][0] - _sq, []).append(_sq)
+    _STEPS.append(tuple((delta, _mask(squares)) for delta, squares in _deltas.items()))
+
+
+def _step(bits, direction):
+    """Squares reached by one step of every bit in a direction."""
+    result = np.zeros_like(bits)
+    for delta, sources in _STEPS[direction]:
+        if delta > 0:
+            result |= (bits & sources) << _U64(delta)
+        else:
+            result |= (bits & sources) >> _U64(-delta)
+    return result
+
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(bits):
+        return np.bitwise_count(bits).astype(np.int32)
+else:
+    # NumPy < 2.0: count the bits of each byte
+    _BYTE_COUNTS = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.int32)
+
+    def _popcount(bits):
+        return _BYTE_COUNTS[bits.astype('<u8').view(np.uint8).reshape(-1, 8)].sum(axis=1)
+
+
+def encode(positions, colors):
+    """
+    Encode Position objects (e.g. rules.Board.position) and their sides to
+    move.
+
+    Returns:
+        (masks, to_move): (N, 3) uint64 array of grey, blue and kings
+        masks, and (N,) int8 array, 1 for grey to move and -1 for blue.
+    """
+    count = len(positions)
+    masks = np.fromiter((mask for position in positions
+                         for mask in (position.grey, position.blue, position.kings)),
+                        dtype=np.uint64, count=3 * count).reshape(count, 3)
+    to_move = np.fromiter((1 if color == GREY else -1 for color in colors), dtype=np.int8, count=count)
+    return masks, to_move
+
+
+def encode_archive(pdn_path):
+    """
+    Every position of a PDN archive, for tuning against game results.
+
+    Returns:
+        (masks, to_move, results): results is the game result from grey's
+        point of view (1 win, 0 draw or unfinished, -1 loss).
+    """
+    outcome = {"2-0": 1, "0-2": -1}
+    positions, colors, results = [], [], []
+    for game in pdn.iter_games(pdn_path):
+        result = outcome.get(game.headers.get("Result"), 0)
+        for position, color, _ in pdn.replay(game):
+            positions.append(position.copy())
+            colors.append(color)
+            results.append(result)
+    masks, to_move = encode(positions, colors)
+    return masks, to_move, np.array(results, dtype=np.int8)
+
+
+def mobility(grey, blue, kings):
+    """Simple moves of grey minus those of blue, for each position."""
+    empty = ~(grey | blue)
+    moves = np.zeros(len(grey), dtype=np.int32)
+    for own, color, sign in ((grey, GREY, 1), (blue, BLUE, -1)):
+        pawns, queens = own & ~kings, own & kings
+        for direction in FORWARD[color]:
+            moves += sign * _popcount(_step(pawns, direction) & empty)
+        # Queens: squares reached step by step until blocked. Two queens
+        # never reach the same square in the same direction, so counting
+        # the union counts every move.
+        for direction in range(4):
+            reach = _step(queens, direction) & empty
+            while reach.any():
+                moves += sign * _popcount(reach)
+                reach = _step(reach, direction) & empty
+    return moves
+
+
+def features(masks):
+    """(N, 6) int32 feature matrix from grey's point of view, columns as FEATURE_NAMES."""
+    result = np.empty((len(masks), len(FEATURE_NAMES)), dtype=np.int32)
+    for start in range(0, len(masks), CHUNK):
+        stop = start + CHUNK
+        grey, blue, kings = masks[start:stop, 0], masks[start:stop, 1], masks[start:stop, 2]
+        grey_pawns, blue_pawns = grey & ~kings, blue & ~kings
+        grey_kings, blue_kings = grey & kings, blue & kings
+        columns = result[start:stop]
+        columns[:, 0] = _popcount(grey_pawns) - _popcount(blue_pawns)
+        columns[:, 1] = _popcount(grey_kings) - _popcount(blue_kings)
+        advance = np.zeros(len(grey), dtype=np.int32)
+        for grey_rows, blue_rows, row_mask in _ADVANCE:
+            advance += grey_rows * _popcount(grey_pawns & row_mask) - blue_rows * _popcount(blue_pawns & row_mask)
+        columns[:, 2] = advance
+        columns[:, 3] = _popcount(grey & _CENTER) - _popcount(blue & _CENTER)
+        columns[:, 4] = _popcount(grey_pawns & _BACK[GREY]) - _popcount(blue_pawns & _BACK[BLUE])
+        columns[:, 5] = mobility(grey, blue, kings)
+    return result
+
+
+def evaluate_batch(masks, to_move, weights=DEFAULT_BATCH_WEIGHTS):
+    """
+    Scores of every position for its side to move, like ai.evaluate.
+
+    Args:
+        weights: one weight per name of FEATURE_NAMES
+    """
+    scores = features(masks) @ np.asarray(weights, dtype=np.int64)
+    return scores * to_move
+
+
+def random_positions(count, seed=1):
+    """Positions reached by random games, with the side to move."""
+    rng = random.Random(seed)
+    positions, colors = [], []
+    while len(positions) < count:
+        position = Position.initial()
+        color = GREY
+        for _ in range(rng.randint(10, 150)):
+            moves = position.moves(color)
+            if not moves or len(positions) == count:
+                break
+            position.make_move(*rng.choice(moves))
+            color = other(color)
+            positions.append(position.copy())
+            colors.append(color)
+    return positions, colors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluation vectorisee de positions")
+    parser.add_argument("-n", "--positions", type=int, default=100000)
+    parser.add_argument("--pdn", help="evaluer les positions d'une archive PDN")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.pdn:
+        masks, to_move, results = encode_archive(args.pdn)
+        positions = [Position(*map(int, row)) for row in masks]
+        colors = [GREY if side == 1 else BLUE for side in to_move]
+    else:
+        positions, colors = random_positions(args.positions, args.seed)
+        masks, to_move = encode(positions, colors)
+
+    start = time.perf_counter()
+    expected = [evaluate(position, color) for position, color in zip(positions, colors)]
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scores = evaluate_batch(masks, to_move)
+    batch_time = time.perf_counter() - start
+
+    if not np.array_equal(scores, expected):
+        raise SystemExit("les scores vectorises different de ai.evaluate")
+    print(f"{len(positions)} positions")
+    print(f"  ai.evaluate     {loop_time:8.3f}s  {len(positions) / loop_time:12.0f} positions/s")
+    print(f"  evaluate_batch  {batch_time:8.3f}s  {len(positions) / batch_time:12.0f} positions/s")
+    print(f"  speedup: x{loop_time / batch_time:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""
+Benchmark of the capture search: memoized bitmask search (Position.moves)
+against the former list-based recursion of Board._pawn_find_captures and
+Board._queen_find_captures, kept below as a reference.
+
+Two families of positions are timed: crowded random middlegames with a
+few queens per side, and queens facing many isolated pawns, which is where
+the old recursion blows up.
+
+Usage:
+    python bench_captures.py [-n POSITIONS] [--seed SEED]
+"""
+
+import argparse
+import random
+import time
+
+from position import (Position, GREY, BLUE, BIT, COORDS, RAYS, NUM_SQUARES, PROMOTION_ROW,
+                      ROWS, COLS)
+
+
+class _OldPiece:
+    __slots__ = ('row', 'col', 'color', 'king')
+
+    def __init__(self, row, col, color, king):
+        self.row = row
+        self.col = col
+        self.color = color
+        self.king = king
+
+
+def _old_grid(position):
+    grid = [[0] * COLS for _ in range(ROWS)]
+    for sq, (row, col) in enumerate(COORDS):
+        color = position.color_at(sq)
+        if color:
+            grid[row][col] = _OldPiece(row, col, color, position.is_king(sq))
+    return grid
+
+
+def _old_pawn_find_captures(grid, start_row, start_col, row_dir, col_dir, color, already_captured):
+    moves = {}
+    enemy_row = start_row + row_dir
+    enemy_col = start_col + col_dir
+    if not (0 <= enemy_row < ROWS and 0 <= enemy_col < COLS):
+        return moves
+    enemy = grid[enemy_row][enemy_col]
+    if enemy == 0 or enemy.color == color or enemy in already_captured:
+        return moves
+    landing_row = enemy_row + row_dir
+    landing_col = enemy_col + col_dir
+    if not (0 <= landing_row < ROWS and 0 <= landing_col < COLS):
+        return moves
+    if grid[landing_row][landing_col] != 0:
+        return moves
+    captured_list = already_captured + [enemy]
+    moves[(landing_row, landing_col)] = captured_list
+    for new_row_dir in [-1, 1]:
+        for new_col_dir in [-1, 1]:
+            additional_captures = _old_pawn_find_captures(
+                grid, landing_row, landing_col, new_row_dir, new_col_dir, color, captured_list)
+            for pos, caps in additional_captures.items():
+                if pos not in moves or len(caps) > len(moves[pos]):
+                    moves[pos] = caps
+    return moves
+
+
+def _old_queen_find_captures(grid, start_row, start_col, row_dir, col_dir, color, already_captured):
+    moves = {}
+    r, c = start_row + row_dir, start_col + col_dir
+    enemy_to_capture = None
+    while 0 <= r < ROWS and 0 <= c < COLS:
+        current = grid[r][c]
+        if current == 0:
+            if enemy_to_capture is not None:
+                captured_list = already_captured + [enemy_to_capture]
+                moves[(r, c)] = captured_list
+                for new_row_dir, new_col_dir in [(-1, -1), (-1, 1), (1, -1), (1, 1)]:
+                    if new_row_dir == -row_dir and new_col_dir == -col_dir:
+                        continue
+                    additional_captures = _old_queen_find_captures(
+                        grid, r, c, new_row_dir, new_col_dir, color, captured_list)
+                    for pos, caps in additional_captures.items():
+                        if pos not in moves or len(caps) > len(moves[pos]):
+                            moves[pos] = caps
+        elif current.color == color:
+            break
+        else:
+            if enemy_to_capture is not None:
+                break
+            if current in already_captured:
+                break
+            enemy_to_capture = current
+        r += row_dir
+        c += col_dir
+    return moves
+
+
+def old_side_captures(grid, color):
+    """Captures of every piece of color with the former recursion."""
+    total = 0
+    for row in grid:
+        for piece in row:
+            if piece != 0 and piece.color == color:
+                finder = _old_queen_find_captures if piece.king else _old_pawn_find_captures
+                moves = {}
+                for row_dir, col_dir in [(-1, -1), (-1, 1), (1, -1), (1, 1)]:
+                    moves.update(finder(grid, piece.row, piece.col, row_dir, col_dir, color, []))
+                total += len(moves)
+    return total
+
+
+def random_middlegame(rng, pieces=32, queens=3):
+    """Crowded random position with a few queens on each side."""
+    grey = blue = kings = 0
+    for i, sq in enumerate(rng.sample(range(NUM_SQUARES), pieces)):
+        color = GREY if i % 2 == 0 else BLUE
+        if color == GREY:
+            grey |= BIT[sq]
+        else:
+            blue |= BIT[sq]
+        if i < 2 * queens or sq // 5 == PROMOTION_ROW[color]:
+            kings |= BIT[sq]
+    return Position(grey, blue, kings)
+
+
+def random_rafle(rng, enemies=12, queens=3):
+    """
+    Grey queens facing isolated blue pawns away from the edges: every pawn
+    can be jumped, so the number of capture sequences explodes.
+    """
+    blue = 0
+    candidates = [sq for sq, (row, col) in enumerate(COORDS) if 0 < row < ROWS - 1 and 0 < col < COLS - 1]
+    rng.shuffle(candidates)
+    for sq in candidates:
+        if blue.bit_count() == enemies:
+            break
+        if not any(ray and blue & BIT[ray[0]] for ray in RAYS[sq]):
+            blue |= BIT[sq]
+    free = [sq for sq in range(NUM_SQUARES) if not blue & BIT[sq]]
+    grey = sum(BIT[sq] for sq in rng.sample(free, queens))
+    return Position(grey, blue, grey)
+
+
+def compare(positions):
+    """Time both searches on every position, for both sides."""
+    old_times = []
+    new_times = []
+    for position in positions:
+        grid = _old_grid(position)
+        for color in (GREY, BLUE):
+            start = time.perf_counter()
+            old_side_captures(grid, color)
+            old_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            position.moves(color)
+            new_times.append(time.perf_counter() - start)
+    return old_times, new_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparaison des recherches de prises")
+    parser.add_argument("-n", "--positions", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    families = {
+        "milieu": [random_middlegame(rng, rng.randint(24, 36), rng.randint(1, 4))
+                   for _ in range(args.positions)],
+        "rafles": [random_rafle(rng, rng.randint(8, 14), rng.randint(2, 4))
+                   for _ in range(args.positions)],
+    }
+
+    for family, positions in families.items():
+        old_times, new_times = compare(positions)
+        print(f"{family}:")
+        for name, times in (("recursion", old_times), ("bitmasks", new_times)):
+            times.sort()
+            print(f"  {name:10} total {sum(times):8.3f}s  median {times[len(times) // 2] * 1e3:8.3f}ms"
+                  f"  max {times[-1] * 1e3:8.3f}ms")
+        print(f"  speedup: x{sum(old_times) / sum(new_times):.1f}")
+
+
+if __name__ == '__main__':
+    main()
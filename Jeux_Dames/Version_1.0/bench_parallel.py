@@ -0,0 +1,91 @@
+"""
+Speedup of ParallelSearch with the number of processes.
+
+Middlegame positions reached by random games are searched to a fixed
+depth, first by a single Engine (the search of EngineWorker), then by
+ParallelSearch with 1, 2, 4, 8... processes. Times are the wall time to
+reach the depth, the transposition table being cleared before every
+position; the pool is started before timing. Scores are checked against
+the single Engine.
+
+The speedup cannot exceed the number of free cores: on a machine with
+fewer cores than processes the extra processes only add overhead.
+
+Usage:
+    python bench_parallel.py -d 7 -n 6 -p 1 2 4 8
+"""
+
+import argparse
+import os
+import random
+import time
+
+from ai import Engine, ParallelSearch
+from position import Position, GREY, other
+
+
+def middlegames(count, seed=1, min_moves=6):
+    """Positions after 10 to 40 random plies where the side to move has a real choice."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        position = Position.initial()
+        color = GREY
+        for _ in range(rng.randint(10, 40)):
+            moves = position.moves(color)
+            if not moves:
+                break
+            position.make_move(*rng.choice(moves))
+            color = other(color)
+        if len(position.moves(color)) >= min_moves:
+            positions.append((position.copy(), color))
+    return positions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Acceleration de la recherche parallele")
+    parser.add_argument("-d", "--depth", type=int, default=6, help="profondeur de recherche")
+    parser.add_argument("-n", "--positions", type=int, default=6)
+    parser.add_argument("-p", "--processes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--tt", type=int, default=20, help="bits de la table de transposition")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    positions = middlegames(args.positions, args.seed)
+    print(f"{len(positions)} positions, profondeur {args.depth}, {os.cpu_count()} coeurs")
+
+    start = time.perf_counter()
+    expected = []
+    nodes = 0
+    for position, color in positions:
+        engine = Engine(time_limit=float("inf"), max_depth=args.depth, tt_bits=args.tt)
+        expected.append(engine.search(position.copy(), color)[1])
+        nodes += engine.nodes
+    serial = time.perf_counter() - start
+    print(f"  Engine      {serial:8.2f}s  {nodes:>10} noeuds  {nodes / serial:8.0f} noeuds/s")
+
+    reference = None
+    for processes in args.processes:
+        search = ParallelSearch(processes, max_depth=args.depth, tt_bits=args.tt)
+        try:
+            search.search(*positions[0], max_depth=2)  # Wait for every process to start
+            elapsed = 0.0
+            nodes = 0
+            agree = 0
+            for (position, color), score in zip(positions, expected):
+                search.table.clear()
+                start = time.perf_counter()
+                _, found, _ = search.search(position, color, time_limit=float("inf"))
+                elapsed += time.perf_counter() - start
+                nodes += search.nodes
+                agree += found == score
+        finally:
+            search.close()
+        reference = reference or elapsed
+        print(f"  {processes:>2} process  {elapsed:8.2f}s  {nodes:>10} noeuds  {nodes / elapsed:8.0f} noeuds/s"
+              f"  x{reference / elapsed:4.2f} (x{serial / elapsed:4.2f} sur Engine)"
+              f"  scores identiques {agree}/{len(positions)}")
+
+
+if __name__ == '__main__':
+    main()
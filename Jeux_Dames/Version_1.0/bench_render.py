@@ -0,0 +1,275 @@
+"""
+Rendering benchmark of the game window, without a screen.
+
+The drawing functions of main.py are timed one by one on scripted
+positions, with SDL_VIDEODRIVER=dummy unless another driver is set:
+    Board.draw                 whole board, every piece
+    Piece.draw                 one piece (time per piece)
+    Game.draw_valid_moves      move markers
+    Game.draw_turn_indicator   header
+    Menu.draw                  the menu, display update included
+
+Scenarios:
+    ouverture  the first plies of seeded random games
+    milieu     crowded middlegames, a marker on every target of the side
+               to move (far more than the selection of one piece shows)
+    finale     queen endings, markers on the queens' targets
+    menu       Menu.draw only
+Each one runs with the piece images of ImageLoader and with the circles
+drawn when the images cannot be loaded.
+
+Times are per call (median and 90th percentile). Allocations are the
+Python memory reached during a call (tracemalloc peak) and what is still
+held after it; surfaces allocated by SDL are not seen by tracemalloc.
+
+Results can be saved as a baseline (JSON) and later runs compared with
+it: a function more than --tolerance slower than its baseline is marked.
+Times depend on the machine, so compare runs made on the same one.
+
+Usage:
+    python bench_render.py
+    python bench_render.py --save
+    python bench_render.py --compare --tolerance 0.15
+    python bench_render.py --scenarios milieu finale --repeat 50
+"""
+
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+import warnings
+
+import pygame
+
+import main as gui
+from position import Position, GREY, BLUE, BIT, COORDS, NUM_SQUARES, squares_of, other
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(BASE_DIR, "bench_render.json")
+SCENARIOS = ('ouverture', 'milieu', 'finale', 'menu')
+FUNCTIONS = ('Board.draw', 'Piece.draw', 'Game.draw_valid_moves', 'Game.draw_turn_indicator', 'Menu.draw')
+
+
+class NoImages(gui.ImageLoader):
+    """Image loader whose images are missing: pieces are drawn as circles"""
+
+    def sprites(self, size):
+        return None
+
+
+def opening_positions(count, seed):
+    """(position, color) after 0 to count - 1 plies of a seeded random game."""
+    rng = random.Random(seed)
+    position = Position.initial()
+    color = GREY
+    positions = []
+    for _ in range(count):
+        positions.append((position.copy(), color))
+        moves = position.moves(color)
+        if not moves:
+            break
+        position.make_move(*rng.choice(moves))
+        color = other(color)
+    return positions
+
+
+def middlegame_positions(count, seed, min_pieces=28):
+    """Positions of random games after 10 to 30 plies, with at least min_pieces pieces."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        position = Position.initial()
+        color = GREY
+        for _ in range(rng.randint(10, 30)):
+            moves = position.moves(color)
+            if not moves:
+                break
+            position.make_move(*rng.choice(moves))
+            color = other(color)
+        if (position.grey | position.blue).bit_count() >= min_pieces and position.moves(color):
+            positions.append((position.copy(), color))
+    return positions
+
+
+def endgame_positions(count, seed):
+    """Two to four queens per side on random squares."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        squares = rng.sample(range(NUM_SQUARES), rng.randint(2, 4) + rng.randint(2, 4))
+        half = len(squares) // 2
+        grey = sum(BIT[sq] for sq in squares[:half])
+        blue = sum(BIT[sq] for sq in squares[half:])
+        position = Position(grey, blue, grey | blue)
+        color = rng.choice((GREY, BLUE))
+        if position.moves(color):
+            positions.append((position, color))
+    return positions
+
+
+def markers(board, position, color):
+    """Move markers for every legal move of color, as Game.valid_moves: {(row, col): captured pieces}."""
+    return {COORDS[to_sq]: [board.get_piece(*COORDS[sq]) for sq in squares_of(captured)]
+            for _, to_sq, captured in position.moves(color)}
+
+
+def calls(win, loader, scenario, positions):
+    """
+    Calls to measure, by function name: lists of functions without
+    arguments, one per drawing (a position, or a piece of a position).
+    """
+    if scenario == 'menu':
+        menu = gui.Menu(win)
+        return {'Menu.draw': [menu.draw]}
+    found = {name: [] for name in FUNCTIONS[:-1]}
+    for position, color in positions:
+        game = gui.Game(win, loader)
+        game.board = gui.Board(loader, position, color)
+        game.turn = color
+        moves = markers(game.board, position, color)
+        found['Board.draw'].append(lambda board=game.board: board.draw(win))
+        found['Piece.draw'].extend(lambda piece=piece: piece.draw(win)
+                                   for row in game.board.board for piece in row if piece != 0)
+        found['Game.draw_valid_moves'].append(lambda game=game, moves=moves: game.draw_valid_moves(moves))
+        found['Game.draw_turn_indicator'].append(game.draw_turn_indicator)
+    return found
+
+
+def time_calls(functions, repeat):
+    """Per call time in microseconds of every function, repeat times each."""
+    times = []
+    clock = time.perf_counter_ns
+    for _ in range(repeat):
+        for function in functions:
+            start = clock()
+            function()
+            times.append((clock() - start) / 1000)
+    return times
+
+
+def allocations(functions):
+    """Mean tracemalloc peak and retained bytes of one call of each function."""
+    peaks = []
+    kept = []
+    tracemalloc.start()
+    try:
+        for function in functions:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            function()
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            kept.append(current - before)
+    finally:
+        tracemalloc.stop()
+    return statistics.mean(peaks), statistics.mean(kept)
+
+
+def measure(win, args):
+    """Results by 'scenario/images/function': time and allocation statistics."""
+    sources = {
+        'ouverture': lambda: opening_positions(args.positions, args.seed),
+        'milieu': lambda: middlegame_positions(args.positions, args.seed),
+        'finale': lambda: endgame_positions(args.positions, args.seed),
+        'menu': lambda: [],
+    }
+    results = {}
+    for scenario in args.scenarios:
+        positions = sources[scenario]()
+        for variant, loader in (('images', gui.ImageLoader()), ('cercles', NoImages())):
+            if scenario == 'menu' and variant == 'cercles':
+                continue  # The menu draws no piece
+            for name, functions in calls(win, loader, scenario, positions).items():
+                time_calls(functions, 1)  # Fonts, sprites and caches ready before timing
+                times = sorted(time_calls(functions, args.repeat))
+                peak, kept = allocations(functions)
+                results[f"{scenario}/{variant}/{name}"] = {
+                    'calls': len(times),
+                    'median_us': round(statistics.median(times), 2),
+                    'p90_us': round(times[int(len(times) * 0.9)], 2),
+                    'peak_bytes': round(peak),
+                    'kept_bytes': round(kept),
+                }
+    return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'sdl': ".".join(map(str, pygame.get_sdl_version())),
+        'driver': pygame.display.get_driver(),
+        'machine': platform.machine(),
+        'date': time.strftime("%Y-%m-%d %H:%M"),
+    }
+
+
+def report(results, baseline=None, tolerance=0.10):
+    """Print the results, with the ratio to the baseline when there is one."""
+    print(f"  {'scenario/images/fonction':<48} {'appels':>7} {'mediane':>10} {'p90':>10}"
+          f" {'pic':>9} {'garde':>8}" + ("   base" if baseline else ""))
+    slower = 0
+    for key, result in results.items():
+        line = (f"  {key:<48} {result['calls']:>7} {result['median_us']:>8.1f}us {result['p90_us']:>8.1f}us"
+                f" {result['peak_bytes'] / 1024:>7.1f}Ko {result['kept_bytes']:>7}o")
+        reference = (baseline or {}).get(key)
+        if reference:
+            ratio = result['median_us'] / max(reference['median_us'], 1e-9)
+            line += f"   x{ratio:4.2f}"
+            if ratio > 1 + tolerance:
+                line += "  PLUS LENT"
+                slower += 1
+        print(line)
+    if baseline:
+        print(f"{slower} mesure(s) plus lente(s) que la reference de plus de {tolerance:.0%}")
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesure du temps d'affichage (pilote video SDL dummy)")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("-n", "--positions", type=int, default=12, help="positions par scenario")
+    parser.add_argument("-r", "--repeat", type=int, default=20, help="passes chronometrees")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", nargs="?", const=BASELINE_FILE, metavar="FICHIER",
+                        help="enregistrer les resultats comme reference")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_FILE, metavar="FICHIER",
+                        help="comparer a une reference enregistree avec --save")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="ecart de temps tolere avant de signaler une mesure plus lente")
+    args = parser.parse_args()
+
+    # Without fc-list pygame warns that it falls back to its default font
+    warnings.filterwarnings("ignore", module="pygame.sysfont")
+    pygame.display.init()
+    pygame.font.init()
+    win = pygame.display.set_mode((gui.WIDTH, gui.HEIGHT))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            saved = json.load(f)
+        baseline = saved['results']
+        print(f"Reference {args.compare}: {saved['environment']}")
+    env = environment()
+    print(f"Affichage {env['driver']}, pygame {env['pygame']} (SDL {env['sdl']}), "
+          f"{args.positions} positions, {args.repeat} passes")
+    results = measure(win, args)
+    report(results, baseline, args.tolerance)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({'environment': env, 'results': results}, f, indent=1)
+        print(f"Reference enregistree dans {args.save}")
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Start-up time of the game, from launching Python to the first menu frame.
+
+main.py is run several times with --startup-time: it prints the wall-clock
+time of each stage once the menu is on screen, then quits. Stages, in
+milliseconds since the process was launched:
+    main    - interpreter started and modules imported
+    window  - display and fonts initialised, window open
+    menu    - first menu frame drawn
+    images  - piece images ready (read in the background after the menu)
+
+Without a display (CI, SSH) use SDL_VIDEODRIVER=dummy, which is the
+default here when DISPLAY is not set.
+
+Usage:
+    python bench_startup.py -n 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STAGES = ('main', 'window', 'menu', 'images')
+
+
+def measure(script=os.path.join(BASE_DIR, "main.py")):
+    """Stages of one launch of script, in ms since it was started."""
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    if not env.get("DISPLAY") and not env.get("WAYLAND_DISPLAY"):
+        env.setdefault("SDL_VIDEODRIVER", "dummy")
+    launched = time.time()
+    result = subprocess.run([sys.executable, script, "--startup-time"], env=env,
+                            capture_output=True, text=True, check=True)
+    stamps = json.loads(result.stdout.strip().splitlines()[-1])
+    return {stage: (stamps[stage] - launched) * 1000 for stage in STAGES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps de demarrage du jeu")
+    parser.add_argument("-n", "--runs", type=int, default=10, help="nombre de lancements")
+    parser.add_argument("--script", default=os.path.join(BASE_DIR, "main.py"))
+    args = parser.parse_args()
+
+    measure(args.script)  # Warm the OS file cache and the sprite cache
+    runs = [measure(args.script) for _ in range(args.runs)]
+    print(f"{args.runs} lancements de {args.script}")
+    print(f"  {'etape':<8} {'mediane':>9} {'min':>9} {'max':>9}")
+    for stage in STAGES:
+        times = [run[stage] for run in runs]
+        print(f"  {stage:<8} {statistics.median(times):8.1f}ms {min(times):8.1f}ms {max(times):8.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
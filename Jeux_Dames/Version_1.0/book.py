@@ -0,0 +1,185 @@
+"""
+Opening book compiled from PDN game archives.
+
+The book is a binary file: a 16-byte header followed by fixed-width
+records (position hash, move, weight, score) sorted by hash. It is opened
+with mmap and searched by bisection, so opening it costs nothing and every
+process using it (GUI, engine worker, tournament pool) shares the same
+pages of the OS cache instead of loading its own copy.
+
+Positions are hashed with Position.zobrist(color to move) and only the
+first plies after the starting layout of Board.create_board (grey to move)
+are recorded. weight is the number of games that played the move; score is
+the average result of those games for the side that played it, in
+thousandths (1000 win, 0 draw or unfinished, -1000 loss).
+
+Usage:
+    python book.py build parties.pdn autres.pdn -o ouvertures.book --plies 16
+    python book.py show ouvertures.book 32-28 19-23
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+
+import pdn
+from position import Position, GREY, BLUE, other
+
+DEFAULT_BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ouvertures.book")
+
+MAGIC = b"DAMEBOOK"
+VERSION = 1
+HEADER = struct.Struct('<8sII')  # magic, version, plies
+RECORD = struct.Struct('<QQBBxxIi')  # hash, captured mask, from, to, weight, score
+
+_RESULT_SCORES = {"2-0": {GREY: 1000, BLUE: -1000}, "0-2": {GREY: -1000, BLUE: 1000}}
+
+
+def build_book(archives, path=DEFAULT_BOOK, plies=16, min_games=1):
+    """
+    Compile the first plies of every game of the archives into a book.
+
+    Moves played in fewer than min_games games are left out. Returns the
+    number of records written.
+    """
+    stats = {}  # (hash, from, to, captured) -> [games, result sum]
+    for archive in archives:
+        for game in pdn.iter_games(archive):
+            results = _RESULT_SCORES.get(game.headers.get("Result"), {GREY: 0, BLUE: 0})
+            for ply, (position, color, move) in enumerate(pdn.replay(game)):
+                if move is None or ply >= plies:
+                    break
+                entry = stats.setdefault((position.zobrist(color), *move), [0, 0])
+                entry[0] += 1
+                entry[1] += results[color]
+
+    records = sorted((key, captured, from_sq, to_sq, games, total // games)
+                     for (key, from_sq, to_sq, captured), (games, total) in stats.items()
+                     if games >= min_games)
+    with open(path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, VERSION, plies))
+        for record in records:
+            out.write(RECORD.pack(*record))
+    return len(records)
+
+
+class OpeningBook:
+    """Read-only, memory-mapped opening book"""
+
+    def __init__(self, path=DEFAULT_BOOK):
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.plies = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path}: not an opening book (version {VERSION})")
+        self.count = (size - HEADER.size) // RECORD.size
+
+    def _key_at(self, i):
+        return struct.unpack_from('<Q', self.data, HEADER.size + i * RECORD.size)[0]
+
+    def entries(self, position, color):
+        """
+        Book moves of color in position.
+
+        Returns:
+            list of ((from_sq, to_sq, captured_mask), weight, score)
+        """
+        key = position.zobrist(color)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        entries = []
+        while low < self.count:
+            found, captured, from_sq, to_sq, weight, score = RECORD.unpack_from(
+                self.data, HEADER.size + low * RECORD.size)
+            if found != key:
+                break
+            entries.append(((from_sq, to_sq, captured), weight, score))
+            low += 1
+        if entries:
+            # A hash collision must never make the engine play an illegal move
+            legal = set(position.moves(color))
+            entries = [entry for entry in entries if entry[0] in legal]
+        return entries
+
+    def choose(self, position, color, rng=None):
+        """
+        A book move for color, or None when the position is not in the book.
+
+        With rng, moves are drawn in proportion to their weight among those
+        that do not lose on average; without it the most played move is
+        returned.
+        """
+        entries = self.entries(position, color)
+        if not entries:
+            return None
+        if rng is None:
+            return max(entries, key=lambda entry: (entry[1], entry[2]))[0]
+        candidates = [entry for entry in entries if entry[2] >= 0] or entries
+        return rng.choices([entry[0] for entry in candidates],
+                           weights=[entry[1] for entry in candidates])[0]
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_book(path=DEFAULT_BOOK):
+    """The book at path, or None if there is no book there."""
+    if path is None or not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bibliotheque d'ouvertures")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_cmd = commands.add_parser("build", help="compiler la bibliotheque depuis des archives PDN")
+    build_cmd.add_argument("archives", nargs="+")
+    build_cmd.add_argument("-o", "--output", default=DEFAULT_BOOK)
+    build_cmd.add_argument("--plies", type=int, default=16,
+                           help="demi-coups enregistres depuis le depart")
+    build_cmd.add_argument("--min-games", type=int, default=1,
+                           help="nombre minimal de parties pour garder un coup")
+    show_cmd = commands.add_parser("show", help="coups de la bibliotheque apres ces coups")
+    show_cmd.add_argument("book")
+    show_cmd.add_argument("moves", nargs="*", help="coups depuis le depart, ex. 32-28 19-23")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build_book(args.archives, args.output, args.plies, args.min_games)
+        print(f"{count} coups enregistres dans {args.output}")
+        return
+
+    position = Position.initial()
+    color = GREY
+    for token in args.moves:
+        move = pdn.parse_move(position, color, token)
+        if move is None:
+            sys.exit(f"coup illegal: {token}")
+        position.make_move(*move)
+        color = other(color)
+    with OpeningBook(args.book) as book:
+        entries = sorted(book.entries(position, color), key=lambda entry: -entry[1])
+    for move, weight, score in entries:
+        print(f"{pdn.move_text(*move):>8}  {weight:>7} parties  score {score / 1000:+.3f}")
+    if not entries:
+        print("position absente de la bibliotheque")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Connection of the GUI to a game server (server.py).
+
+RemoteOpponent has the interface of ai.EngineWorker (thinking, request,
+poll, cancel, close, played), so Game drives a player on the network like
+the computer: request() starts waiting for the opponent's move and poll()
+returns it once the server has sent it; result() tells when the server
+ended the game (resignation, player gone) and interrupted() when it
+cannot go on without a winner (connection lost). A background thread reads the
+socket, so the GUI never blocks on the network.
+"""
+
+import json
+import queue
+import socket
+import threading
+from collections import deque
+
+from position import other
+
+
+class RemoteOpponent:
+    """The other player of a game hosted by server.py"""
+
+    def __init__(self, host, port, game_id=None, timeout=5.0):
+        """
+        Connect and take a seat: in game game_id, or in the first game
+        waiting for an opponent. Raises OSError when the server cannot be
+        reached or refuses the seat.
+        """
+        self.socket = socket.create_connection((host, port), timeout)
+        self.file = self.socket.makefile("rwb")
+        self._send({"op": "join", "game": game_id} if game_id is not None else {"op": "play"})
+        state = self._receive()
+        if state.get("ev") != "state":
+            self.close()
+            raise ConnectionError(state.get("msg", "reponse inattendue du serveur"))
+        self.socket.settimeout(None)
+        self.game_id = state["game"]
+        self.color = other(state["color"])  # Side played by the opponent
+        self.moves = [tuple(move) for move in state["moves"]]  # Played before we joined
+        self.ply = len(self.moves)
+        self.winner = None  # GREY or BLUE once the server ends the game
+        self.reason = None  # Why the game ended, or why it cannot go on
+        self.over = False  # Ended by the server, or the connection is lost
+        self.pending = False
+        self.received = deque()  # Opponent moves not yet taken by poll()
+        self.events = queue.Queue()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _send(self, message):
+        self.file.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+        self.file.flush()
+
+    def _receive(self):
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("connexion fermee par le serveur")
+        return json.loads(line)
+
+    def _read(self):
+        try:
+            for line in self.file:
+                self.events.put(json.loads(line))
+        except (OSError, ValueError):
+            pass
+        self.events.put({"ev": "closed"})
+
+    @property
+    def thinking(self):
+        return self.pending
+
+    def request(self, position, color):
+        """Wait for the opponent's move (position is the one it will play in)."""
+        self.pending = True
+
+    def played(self, move):
+        """Send a move of the local player."""
+        self.ply += 1
+        try:
+            self._send({"op": "move", "m": list(move)})
+        except OSError:
+            pass  # The reader thread reports the lost connection
+
+    def poll(self):
+        """
+        Non-blocking check for the opponent's move.
+
+        Returns:
+            (done, move) like EngineWorker.poll.
+        """
+        self._drain()
+        if self.pending and self.received:
+            self.pending = False
+            return True, self.received.popleft()
+        return False, None
+
+    def result(self):
+        """Winner (GREY or BLUE) of a game ended by the server, else None."""
+        self._drain()
+        return self.winner
+
+    def interrupted(self):
+        """Why the game stopped without a winner (e.g. connection lost), else None."""
+        self._drain()
+        return self.reason if self.over and self.winner is None else None
+
+    def _drain(self):
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                return
+            kind = event.get("ev")
+            if kind == "move" and event["ply"] > self.ply:
+                # Our own moves come back too, with a ply already counted
+                self.ply = event["ply"]
+                self.received.append(tuple(event["m"]))
+            elif kind == "end":
+                self.winner, self.reason = event["winner"], event["reason"]
+                self.over = True
+                self.pending = False
+            elif kind == "closed" and not self.over:
+                print("Warning: connection to the server lost")
+                self.reason = "connexion perdue"
+                self.over = True
+                self.pending = False  # No move will come
+            elif kind == "error":
+                print(f"Warning: server: {event['msg']}")
+
+    def cancel(self):
+        self.pending = False
+
+    def close(self):
+        """Leave the game (the server counts it as lost if it is not over)."""
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.file.close()
+        self.socket.close()
@@ -0,0 +1,159 @@
+"""
+Load test of the game server: many bot clients on localhost.
+
+Every bot opens its own connection, asks for a game ("play") and plays
+random legal moves, rebuilding the board from the move deltas sent by the
+server. Bots are paired by the server, so --games games run at the same
+time. A game stops when it is won or when the side to move reaches
+--plies moves and resigns.
+
+The latency of a move is the time between sending it and receiving the
+server's delta for it: parsing, rule checks and the broadcast to both
+players, under the load of every other game.
+
+The server is started in a separate process unless --connect is given.
+
+Usage:
+    python load_test.py --games 1000 --plies 60
+    python load_test.py --connect localhost:7520 --games 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+from position import Position, GREY, other
+from server import DEFAULT_HOST, encode
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Bots connecting at the same time, so the listen backlog never overflows
+CONNECT_BATCH = 100
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []  # Seconds, one per move
+        self.games = 0
+        self.errors = 0
+
+
+async def bot(host, port, plies, think, rng, stats, connecting):
+    async with connecting:
+        reader, writer = await asyncio.open_connection(host, port)
+    writer.write(encode({"op": "play"}))
+    position = Position.initial()
+    turn = GREY
+    color = None
+    ply = 0
+    sent = None  # When our last move was sent
+
+    async def move():
+        nonlocal sent
+        moves = position.moves(turn)
+        if not moves:
+            return  # Lost: the server's end event follows
+        if ply >= plies:
+            writer.write(encode({"op": "resign"}))
+            return
+        if think:
+            await asyncio.sleep(rng.uniform(0, 2 * think))
+        sent = time.perf_counter()
+        writer.write(encode({"op": "move", "m": list(rng.choice(moves))}))
+
+    try:
+        async for line in reader:
+            event = json.loads(line)
+            kind = event["ev"]
+            if kind == "state":
+                color = event["color"]
+                for played in event["moves"]:
+                    position.make_move(*played)
+                    turn = other(turn)
+                ply = len(event["moves"])
+            elif kind == "start" and turn == color:
+                await move()
+            elif kind == "move":
+                if turn == color:
+                    stats.latencies.append(time.perf_counter() - sent)
+                position.make_move(*event["m"])
+                turn = other(turn)
+                ply = event["ply"]
+                if turn == color:
+                    await move()
+            elif kind == "end":
+                if color == GREY:
+                    stats.games += 1  # Counted once per game
+                break
+            elif kind == "error":
+                stats.errors += 1
+                break
+    finally:
+        writer.close()
+
+
+async def start_server():
+    """Run server.py on a free port; returns (process, port)."""
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.join(BASE_DIR, "server.py"), "--port", "0", stdout=asyncio.subprocess.PIPE)
+    line = (await process.stdout.readline()).decode()
+    return process, int(line.rsplit(":", 1)[1])
+
+
+async def run(args):
+    process = None
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        host, port = host or DEFAULT_HOST, int(port)
+    else:
+        process, port = await start_server()
+        host = DEFAULT_HOST
+    stats = Stats()
+    rng = random.Random(args.seed)
+    connecting = asyncio.Semaphore(CONNECT_BATCH)
+    start = time.perf_counter()
+    try:
+        results = await asyncio.gather(
+            *(bot(host, port, args.plies, args.think / 1000, random.Random(rng.random()), stats, connecting)
+              for _ in range(2 * args.games)),
+            return_exceptions=True)
+    finally:
+        if process is not None:
+            process.terminate()
+            await process.wait()
+    elapsed = time.perf_counter() - start
+    failures = [result for result in results if isinstance(result, Exception)]
+    return stats, elapsed, failures
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge du serveur de parties")
+    parser.add_argument("--games", type=int, default=500, help="parties simultanees (deux robots par partie)")
+    parser.add_argument("--plies", type=int, default=60, help="demi-coups avant abandon")
+    parser.add_argument("--think", type=float, default=0.0,
+                        help="temps de reflexion moyen des robots, en ms")
+    parser.add_argument("--connect", metavar="HOTE:PORT", help="serveur deja lance (sinon server.py est demarre)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    stats, elapsed, failures = asyncio.run(run(args))
+    latencies = sorted(stats.latencies)
+    print(f"{2 * args.games} robots, {stats.games} parties terminees en {elapsed:.1f}s")
+    print(f"  {len(latencies)} coups, {len(latencies) / elapsed:.0f} coups/s")
+    if latencies:
+        print("  latence des coups: " + "  ".join(
+            f"{name} {percentile(latencies, fraction) * 1000:.1f}ms"
+            for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))))
+    if stats.errors or failures:
+        print(f"  {stats.errors} erreurs du serveur, {len(failures)} robots en echec: {failures[:3]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,18 @@
 import pygame
 import sys
 import os
+import argparse
+import functools
+import json
+import threading
+import time
+import zlib
 
-# Initialize pygame
-pygame.init()
+import pdn
+import rules
+from position import BIT, COORDS, square_index, squares_of, other
+from profiler import FrameProfiler
+# ai, book and tablebase are imported when first needed, to open the menu sooner
 
 # Constants
 BOARD_SIZE = 700
@@ -12,6 +21,7 @@ WIDTH = BOARD_SIZE
 HEIGHT = BOARD_SIZE + HEADER_HEIGHT  # Total window height
 ROWS, COLS = 10, 10  # 10x10 for international checkers
 SQUARE_SIZE = BOARD_SIZE // COLS
+MIN_SQUARE_SIZE = 40  # Smallest squares when the window is made smaller
 MENU_HEIGHT = 60
 
 # Colors
@@ -32,51 +42,198 @@ BOARD_THEME = {"light": WHITE, "dark": BLACK}
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # Images are in the parent directory's image folder
 IMAGE_DIR = os.path.join(os.path.dirname(BASE_DIR), "image")
+# Piece images, in their order in the texture atlas
+SPRITE_FILES = {
+    'pion_bleu': "pion bleu.png",
+    'pion_gris': "pion gris.png",
+    'reine_bleu': "reine bleu.png",
+    'reine_gris': "reine gris.png",
+}
+PIECE_SCALE = 0.8  # Piece size relative to a square
+# Scaled atlases saved between launches
+SPRITE_CACHE_DIR = os.path.join(BASE_DIR, "cache_images")
+
+# Every game played is appended to this archive (see pdn.py)
+GAMES_FILE = os.path.join(BASE_DIR, "parties.pdn")
+
+# Main loop: it sleeps in pygame.event.wait until an event comes, or at
+# most IDLE_TIMEOUT ms; while the computer thinks it wakes every
+# POLL_INTERVAL ms to collect its move and animate the header
+IDLE_TIMEOUT = 1000
+POLL_INTERVAL = 50
+FPS_CAP = 60  # Default frame-rate cap, 0 for none
+
+# Search time of a hint (H key), on every core (see ai.ParallelSearch)
+HINT_TIME = 3.0
+
+# Frame timings shown with the P key (see profiler.py)
+PROFILER = FrameProfiler()
+PROFILER_INTERVAL = 250  # ms between two refreshes of the overlay text
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(family, size, bold=False):
+    """pygame font, looked up on the system once per (family, size, bold)"""
+    return pygame.font.SysFont(family, size, bold=bold)
+
+
+@functools.lru_cache(maxsize=256)
+def render_text(text, color, size, bold=False, family='arial'):
+    """Rendered text surface, cached on (text, colour, font). Do not draw on it."""
+    return get_font(family, size, bold).render(text, True, color)
+
+
+def resize_window(width, height, image_loader):
+    """
+    Lay the game out again for a window of width x height pixels: the
+    board takes the largest whole squares that fit under the header, and
+    the piece sprites are switched to the matching size.
+    """
+    global BOARD_SIZE, WIDTH, HEIGHT, SQUARE_SIZE
+    SQUARE_SIZE = max(MIN_SQUARE_SIZE, min(width, height - HEADER_HEIGHT) // COLS)
+    BOARD_SIZE = SQUARE_SIZE * COLS
+    WIDTH = BOARD_SIZE
+    HEIGHT = BOARD_SIZE + HEADER_HEIGHT
+    # Surfaces drawn for the old square size
+    Board._squares_surface = None
+    Game._blocked_surface = None
+    image_loader.resize(int(SQUARE_SIZE * PIECE_SCALE))
 
 
 class ImageLoader:
-    """Handles loading and scaling of game images"""
-    
-    def __init__(self):
-        self.images = {}
-        self.load_images()
-    
-    def load_images(self):
+    """
+    Loads the piece images into one texture atlas per piece size.
+
+    The four PNGs are decoded only when a size is missing from the disk
+    cache; the scaled atlas is then saved as raw RGBA so that later
+    launches skip decoding and scaling. Atlases are converted to the
+    display format, so blitting a sprite needs no per-pixel conversion.
+
+    Nothing is loaded on creation: preload() reads the atlas of the board
+    size on a background thread, and the first use of the images waits for
+    it if needed. When the window is resized, resize() switches to the
+    atlas of the new piece size, read from the cache or scaled from the
+    images decoded in memory: the PNGs are decoded once at most.
+    """
+
+    def __init__(self, cache_dir=SPRITE_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._sources = None  # Decoded PNGs, kept to scale other sizes
+        self._atlases = {}  # piece size -> {sprite name: subsurface of the atlas}
+        self.piece_size = int(SQUARE_SIZE * PIECE_SCALE)
+        self._images = None
+        self._loading = None  # Thread started by preload()
+        self._preloaded = None  # Atlas, or the error, left by that thread
+
+    @property
+    def images(self):
+        if self._images is None:
+            self._images = self.sprites(self.piece_size) or {}
+        return self._images
+
+    @property
+    def images_loaded(self):
+        return bool(self.images)
+
+    def preload(self):
+        """Start reading the atlas of the board size in the background."""
+        if self._loading is None and self._images is None:
+            self._loading = threading.Thread(target=self._preload, args=(self.piece_size,), daemon=True)
+            self._loading.start()
+
+    def resize(self, piece_size):
+        """Draw the pieces with sprites of piece_size pixels from now on."""
+        if piece_size != self.piece_size:
+            self.piece_size = piece_size
+            self._images = None
+
+    def _preload(self, size):
+        # Decoding and scaling only, the display belongs to the main thread
         try:
-            # Load piece images
-            self.images['pion_bleu'] = pygame.image.load(os.path.join(IMAGE_DIR, "pion bleu.png"))
-            self.images['pion_gris'] = pygame.image.load(os.path.join(IMAGE_DIR, "pion gris.png"))
-            self.images['reine_bleu'] = pygame.image.load(os.path.join(IMAGE_DIR, "reine bleu.png"))
-            self.images['reine_gris'] = pygame.image.load(os.path.join(IMAGE_DIR, "reine gris.png"))
-            
-            # Scale images to fit squares
-            piece_size = int(SQUARE_SIZE * 0.8)
-            for key in self.images:
-                self.images[key] = pygame.transform.smoothscale(self.images[key], (piece_size, piece_size))
-                
-            self.images_loaded = True
-        except Exception as e:
-            print(f"Warning: Could not load images: {e}")
-            self.images_loaded = False
-    
-    def get_image(self, piece_type, is_king):
-        if not self.images_loaded:
+            self._preloaded = self._read_atlas(size)
+        except (pygame.error, OSError) as e:
+            self._preloaded = e
+
+    def _read_atlas(self, size):
+        return self._cached_atlas(size) or self._build_atlas(size)
+
+    def sprites(self, size):
+        """Sprites scaled to size pixels, by name, or None if the images cannot be loaded."""
+        if size not in self._atlases:
+            try:
+                if self._loading is not None and size == self.piece_size:
+                    self._loading.join()
+                    atlas, self._loading, self._preloaded = self._preloaded, None, None
+                    if isinstance(atlas, Exception):
+                        raise atlas
+                else:
+                    atlas = self._read_atlas(size)
+            except (pygame.error, OSError) as e:
+                print(f"Warning: Could not load images: {e}")
+                return None
+            if pygame.display.get_surface() is not None:
+                atlas = atlas.convert_alpha()
+            self._atlases[size] = {name: atlas.subsurface((i * size, 0, size, size))
+                                   for i, name in enumerate(SPRITE_FILES)}
+        return self._atlases[size]
+
+    def _cache_path(self, size):
+        # The file name changes when a source image is modified
+        stamp = []
+        for filename in SPRITE_FILES.values():
+            info = os.stat(os.path.join(IMAGE_DIR, filename))
+            stamp.append(f"{filename}:{info.st_size}:{info.st_mtime_ns}")
+        key = zlib.crc32("|".join(stamp).encode())
+        return os.path.join(self.cache_dir, f"pieces_{size}_{key:08x}.rgba")
+
+    def _cached_atlas(self, size):
+        path = self._cache_path(size)
+        if not os.path.exists(path):
             return None
-        
+        with open(path, "rb") as cached:
+            data = cached.read()
+        if len(data) != 4 * size * size * len(SPRITE_FILES):
+            return None
+        return pygame.image.frombytes(data, (size * len(SPRITE_FILES), size), "RGBA")
+
+    def _build_atlas(self, size):
+        if self._sources is None:
+            self._sources = [pygame.image.load(os.path.join(IMAGE_DIR, filename))
+                             for filename in SPRITE_FILES.values()]
+        atlas = pygame.Surface((size * len(SPRITE_FILES), size), pygame.SRCALPHA)
+        for i, image in enumerate(self._sources):
+            atlas.blit(pygame.transform.smoothscale(image, (size, size)), (i * size, 0))
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._cache_path(size)
+            with open(path + ".tmp", "wb") as cached:
+                cached.write(pygame.image.tobytes(atlas, "RGBA"))
+            os.replace(path + ".tmp", path)
+        except OSError:
+            pass  # The cache is only an optimisation
+        return atlas
+
+    def get_image(self, piece_type, is_king, size=None):
+        if size is not None and size != self.piece_size:
+            images = self.sprites(size)
+        else:
+            images = self.images
+        if not images:
+            return None
+
         if piece_type == 'blue':
-            return self.images['reine_bleu'] if is_king else self.images['pion_bleu']
+            return images['reine_bleu'] if is_king else images['pion_bleu']
         else:  # grey
-            return self.images['reine_gris'] if is_king else self.images['pion_gris']
+            return images['reine_gris'] if is_king else images['pion_gris']
 
 
-class Piece:
-    """Represents a game piece (pawn or queen)"""
-    
+class Piece(rules.Piece):
+    """Represents a game piece (pawn or queen), drawn with the game images"""
+
+    __slots__ = ('image_loader', 'x', 'y')
+
     def __init__(self, row, col, color, image_loader):
-        self.row = row
-        self.col = col
-        self.color = color  # 'blue' or 'grey'
-        self.king = False
+        super().__init__(row, col, color)
         self.image_loader = image_loader
         self.x = 0
         self.y = 0
@@ -86,9 +243,6 @@ class Piece:
         self.x = SQUARE_SIZE * self.col + SQUARE_SIZE // 2
         self.y = HEADER_HEIGHT + SQUARE_SIZE * self.row + SQUARE_SIZE // 2
 
-    def make_king(self):
-        self.king = True
-
     def draw(self, win):
         image = self.image_loader.get_image(self.color, self.king)
         if image:
@@ -101,352 +255,95 @@ class Piece:
             pygame.draw.circle(win, GREY, (self.x, self.y), radius + 3)
             pygame.draw.circle(win, color, (self.x, self.y), radius)
             if self.king:
-                font = pygame.font.SysFont('arial', 20, bold=True)
-                crown = font.render('R', True, WHITE)
+                crown = render_text('R', WHITE, 20, bold=True)
                 win.blit(crown, (self.x - crown.get_width() // 2, self.y - crown.get_height() // 2))
 
     def move(self, row, col):
-        self.row = row
-        self.col = col
+        super().move(row, col)
         self.calc_pos()
 
-    def __repr__(self):
-        return f"Piece({self.row}, {self.col}, {self.color}, king={self.king})"
 
+class Board(rules.Board):
+    """Represents the game board, drawn with pygame"""
 
-class Board:
-    """Represents the game board"""
+    _squares_surface = None  # Checkerboard rendered once, shared by every board
     
-    def __init__(self, image_loader):
-        self.board = []
-        self.grey_left = self.blue_left = 20  # 20 pieces each for 10x10
-        self.grey_kings = self.blue_kings = 0
+    def __init__(self, image_loader, position=None, turn='grey'):
         self.image_loader = image_loader
-        self.create_board()
+        self.dirty = set()  # Squares (row, col) changed since the last frame
+        super().__init__(position, turn)
 
-    def draw_squares(self, win):
-        # Dessiner le plateau avec cases alternées noir/blanc
-        # Les pièces jouent sur les cases NOIRES
-        win.fill(BOARD_THEME["light"])  # Fond blanc
-        for row in range(ROWS):
-            for col in range(COLS):
-                # Cases noires où (row + col) est impair
-                if (row + col) % 2 == 1:
-                    pygame.draw.rect(win, BOARD_THEME["dark"], 
-                                   (col * SQUARE_SIZE, HEADER_HEIGHT + row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
-
-    def create_board(self):
-        self.board = []
-        self.grey_left = self.blue_left = 20
-        self.grey_kings = self.blue_kings = 0
-        
-        for row in range(ROWS):
-            self.board.append([])
-            for col in range(COLS):
-                # Pièces uniquement sur les cases noires (où row + col est impair)
-                if (row + col) % 2 == 1:
-                    if row < 4:  # 4 premières rangées pour les bleus
-                        self.board[row].append(Piece(row, col, 'blue', self.image_loader))
-                    elif row > 5:  # 4 dernières rangées pour les gris
-                        self.board[row].append(Piece(row, col, 'grey', self.image_loader))
-                    else:
-                        self.board[row].append(0)
-                else:
-                    self.board[row].append(0)
+    def new_piece(self, row, col, color):
+        return Piece(row, col, color, self.image_loader)
 
-    def draw(self, win):
-        self.draw_squares(win)
-        for row in range(ROWS):
-            for col in range(COLS):
-                piece = self.board[row][col]
-                if piece != 0:
-                    piece.draw(win)
+    def set_position(self, position, turn='grey'):
+        super().set_position(position, turn)
+        self.dirty.update(rules.COORDS)
 
     def move(self, piece, row, col):
-        # Swap positions
-        self.board[piece.row][piece.col], self.board[row][col] = \
-            self.board[row][col], self.board[piece.row][piece.col]
-        piece.move(row, col)
-
-        # Check for king promotion
-        if row == ROWS - 1 and piece.color == 'blue' and not piece.king:
-            piece.make_king()
-            self.blue_kings += 1
-        elif row == 0 and piece.color == 'grey' and not piece.king:
-            piece.make_king()
-            self.grey_kings += 1
-
-    def get_piece(self, row, col):
-        if 0 <= row < ROWS and 0 <= col < COLS:
-            return self.board[row][col]
-        return None
+        self.dirty.add((piece.row, piece.col))
+        self.dirty.add((row, col))
+        super().move(piece, row, col)
 
     def remove(self, pieces):
         for piece in pieces:
             if piece != 0:
-                self.board[piece.row][piece.col] = 0
-                if piece.color == 'grey':
-                    self.grey_left -= 1
-                else:
-                    self.blue_left -= 1
-
-    def winner(self):
-        if self.grey_left <= 0:
-            return "BLEU"
-        elif self.blue_left <= 0:
-            return "GRIS"
-        return None
+                self.dirty.add((piece.row, piece.col))
+        super().remove(pieces)
 
-    def get_valid_moves(self, piece):
-        """Get all valid moves for a piece, including captures"""
-        moves = {}  # {(row, col): [skipped_pieces]}
-        
-        if piece.king:
-            # Queens can move in all 4 diagonal directions, multiple squares
-            moves.update(self._get_queen_moves(piece))
-        else:
-            # Regular pieces move forward only (direction depends on color)
-            moves.update(self._get_pawn_moves(piece))
-        
-        return moves
-
-    def _get_pawn_moves(self, piece):
-        """
-        Get valid moves for a regular pawn following international checkers rules.
-        
-        Movement rules:
-        - Simple moves: Only forward diagonally, one square at a time
-        - Cannot move backward in simple movement
-        
-        Capture rules:
-        - Capture is mandatory
-        - Can capture forward AND backward during capture jumps
-        - Must continue capturing if multiple captures are possible
-        """
-        moves = {}
-        row = piece.row
-        col = piece.col
-        
-        # First, check for captures in ALL 4 directions (pawns can capture backward too!)
-        capture_moves = {}
-        for row_dir in [-1, 1]:  # Both up and down
-            for col_dir in [-1, 1]:  # Both left and right
-                capture_moves.update(self._pawn_find_captures(row, col, row_dir, col_dir, piece.color, []))
-        
-        # If captures are available, only return capture moves (capture is mandatory)
-        if capture_moves:
-            return capture_moves
-        
-        # No captures available - return simple forward moves only
-        # Grey moves up (decreasing row), Blue moves down (increasing row)
-        forward_dir = -1 if piece.color == 'grey' else 1
-        
-        for col_dir in [-1, 1]:
-            new_row = row + forward_dir
-            new_col = col + col_dir
-            if 0 <= new_row < ROWS and 0 <= new_col < COLS:
-                if self.board[new_row][new_col] == 0:
-                    moves[(new_row, new_col)] = []
-        
-        return moves
-    
-    def _pawn_find_captures(self, start_row, start_col, row_dir, col_dir, color, already_captured):
-        """
-        Find captures for a pawn in a specific diagonal direction.
-        
-        Pawn capture rules:
-        - Can capture by jumping over an adjacent enemy piece
-        - Must land on the empty square immediately after the enemy
-        - Can capture in all 4 diagonal directions (forward AND backward)
-        - Must continue capturing if more captures are available (chain captures)
-        
-        Args:
-            start_row, start_col: Current position
-            row_dir, col_dir: Direction to check for capture
-            color: Pawn's color
-            already_captured: List of pieces already captured in this chain
-        
-        Returns:
-            dict: {(landing_row, landing_col): [list of captured pieces]}
-        """
-        moves = {}
-        
-        # Check the adjacent square for an enemy piece
-        enemy_row = start_row + row_dir
-        enemy_col = start_col + col_dir
-        
-        if not (0 <= enemy_row < ROWS and 0 <= enemy_col < COLS):
-            return moves
-        
-        enemy = self.board[enemy_row][enemy_col]
-        
-        # Must be an enemy piece (not empty, not our color, not already captured)
-        if enemy == 0 or enemy.color == color or enemy in already_captured:
-            return moves
-        
-        # Check the landing square (must be empty)
-        landing_row = enemy_row + row_dir
-        landing_col = enemy_col + col_dir
-        
-        if not (0 <= landing_row < ROWS and 0 <= landing_col < COLS):
-            return moves
-        
-        if self.board[landing_row][landing_col] != 0:
-            return moves
-        
-        # Valid capture found!
-        captured_list = already_captured + [enemy]
-        moves[(landing_row, landing_col)] = captured_list
-        
-        # Look for additional captures from the landing position (chain captures)
-        # Check all 4 directions for more captures
-        for new_row_dir in [-1, 1]:
-            for new_col_dir in [-1, 1]:
-                additional_captures = self._pawn_find_captures(
-                    landing_row, landing_col, new_row_dir, new_col_dir, color, captured_list
-                )
-                # Merge captures, preferring longer chains
-                for pos, caps in additional_captures.items():
-                    if pos not in moves or len(caps) > len(moves[pos]):
-                        moves[pos] = caps
-        
-        return moves
+    def make_move(self, from_sq, to_sq, captured):
+        self.dirty.add(COORDS[from_sq])
+        self.dirty.add(COORDS[to_sq])
+        self.dirty.update(COORDS[sq] for sq in squares_of(captured))
+        return super().make_move(from_sq, to_sq, captured)
 
-    def _get_queen_moves(self, piece):
-        """
-        Get valid moves for a queen following official international checkers rules.
-        
-        Official rules for queens:
-        1. Can move diagonally in all 4 directions (forward and backward)
-        2. Can move multiple empty squares in one direction
-        3. Can capture by jumping over an enemy piece at any distance, 
-           landing on any empty square after the captured piece
-        4. Must perform multiple captures if possible (chain captures)
-        5. Cannot jump over the same piece twice
-        6. Cannot jump over own pieces
-        """
-        moves = {}
-        
-        # All 4 diagonal directions: (row_direction, col_direction)
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-        
-        # First, check if there are any captures available
-        capture_moves = {}
-        for row_dir, col_dir in directions:
-            capture_moves.update(self._queen_find_captures(
-                piece.row, piece.col, row_dir, col_dir, piece.color, []
-            ))
-        
-        # If captures are available, only return capture moves
-        if capture_moves:
-            return capture_moves
-        
-        # No captures available, return regular moves
-        for row_dir, col_dir in directions:
-            moves.update(self._queen_regular_moves(
-                piece.row, piece.col, row_dir, col_dir, piece.color
-            ))
-        
-        return moves
+    def unmake_move(self):
+        record = super().unmake_move()
+        if record is not None:
+            piece, from_sq, to_sq, skipped = record
+            self.dirty.add(COORDS[from_sq])
+            self.dirty.add(COORDS[to_sq])
+            self.dirty.update((enemy.row, enemy.col) for enemy in skipped)
+        return record
 
-    def _queen_regular_moves(self, start_row, start_col, row_dir, col_dir, color):
-        """
-        Get regular (non-capture) moves for a queen in one diagonal direction.
-        Queen can move any number of empty squares in a diagonal.
-        """
-        moves = {}
-        r, c = start_row + row_dir, start_col + col_dir
-        
-        # Move along the diagonal until we hit a piece or board edge
-        while 0 <= r < ROWS and 0 <= c < COLS:
-            current = self.board[r][c]
-            if current == 0:
-                # Empty square - queen can move here
-                moves[(r, c)] = []
-            else:
-                # Hit a piece (own or enemy) - stop
-                break
-            r += row_dir
-            c += col_dir
-        
-        return moves
+    @classmethod
+    def squares_surface(cls):
+        """The empty checkerboard, pre-rendered on first use"""
+        if cls._squares_surface is None:
+            # Dessiner le plateau avec cases alternées noir/blanc
+            # Les pièces jouent sur les cases NOIRES
+            surface = pygame.Surface((BOARD_SIZE, BOARD_SIZE))
+            surface.fill(BOARD_THEME["light"])  # Fond blanc
+            for row in range(ROWS):
+                for col in range(COLS):
+                    # Cases noires où (row + col) est impair
+                    if (row + col) % 2 == 1:
+                        pygame.draw.rect(surface, BOARD_THEME["dark"],
+                                         (col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert()
+            cls._squares_surface = surface
+        return cls._squares_surface
 
-    def _queen_find_captures(self, start_row, start_col, row_dir, col_dir, color, already_captured):
-        """
-        Trouve toutes les captures possibles pour une reine dans une direction diagonale.
-        
-        Règles officielles des dames internationales pour la reine:
-        - La reine peut capturer une pièce ennemie (pion ou reine) à n'importe quelle distance
-        - La reine doit atterrir sur une case vide après la pièce capturée
-        - La reine peut atterrir sur n'importe quelle case vide après la pièce capturée
-        - Depuis chaque position d'atterrissage, vérifier les captures supplémentaires
-        - Ne peut pas capturer la même pièce deux fois
-        
-        Args:
-            start_row, start_col: Position de départ
-            row_dir, col_dir: Direction de recherche
-            color: Couleur de la reine ('grey' ou 'blue')
-            already_captured: Liste des pièces déjà capturées dans cette chaîne
-        
-        Returns:
-            dict: {(row_atterrissage, col_atterrissage): [liste des pièces capturées]}
-        """
-        moves = {}
-        r, c = start_row + row_dir, start_col + col_dir
-        enemy_to_capture = None
-        
-        # Parcourir la diagonale pour trouver un ennemi à capturer
-        while 0 <= r < ROWS and 0 <= c < COLS:
-            current = self.board[r][c]
-            
-            if current == 0:
-                # Case vide
-                if enemy_to_capture is not None:
-                    # On a trouvé un ennemi avant, on peut atterrir ici après capture
-                    captured_list = already_captured + [enemy_to_capture]
-                    moves[(r, c)] = captured_list
-                    
-                    # Depuis cette position, chercher des captures supplémentaires
-                    # Vérifier les 4 directions sauf retour en arrière
-                    for new_row_dir, new_col_dir in [(-1, -1), (-1, 1), (1, -1), (1, 1)]:
-                        # Ne pas revenir dans la direction opposée exacte
-                        if new_row_dir == -row_dir and new_col_dir == -col_dir:
-                            continue
-                        
-                        # Chercher récursivement plus de captures
-                        additional_captures = self._queen_find_captures(
-                            r, c, new_row_dir, new_col_dir, color, captured_list
-                        )
-                        
-                        # Fusionner les captures (garder celles avec plus de captures)
-                        for pos, caps in additional_captures.items():
-                            if pos not in moves or len(caps) > len(moves[pos]):
-                                moves[pos] = caps
-                # Si pas encore d'ennemi trouvé, continuer la recherche
-            
-            elif current.color == color:
-                # Pièce alliée - ne peut pas passer, arrêter la recherche
-                break
-            
-            else:
-                # Pièce ennemie trouvée (pion OU reine adverse)
-                if enemy_to_capture is not None:
-                    # Déjà trouvé un ennemi - ne peut pas sauter deux pièces d'affilée
-                    break
-                
-                # Vérifier si cette pièce a déjà été capturée dans la chaîne
-                if current in already_captured:
-                    break
-                
-                # Marquer cet ennemi comme trouvé pour capture
-                enemy_to_capture = current
-            
-            r += row_dir
-            c += col_dir
-        
-        return moves
+    def draw_squares(self, win):
+        win.blit(self.squares_surface(), (0, HEADER_HEIGHT))
 
+    def draw_square(self, win, row, col):
+        """Redraw one square and its piece. Returns the screen rect touched."""
+        area = pygame.Rect(col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+        win.blit(self.squares_surface(), (area.x, HEADER_HEIGHT + area.y), area)
+        piece = self.board[row][col]
+        if piece != 0:
+            piece.draw(win)
+        return area.move(0, HEADER_HEIGHT)
 
+    def draw(self, win):
+        self.draw_squares(win)
+        for row in range(ROWS):
+            for col in range(COLS):
+                piece = self.board[row][col]
+                if piece != 0:
+                    piece.draw(win)
 
     def set_theme(self, theme_index):
         # Theme is fixed to black and white
@@ -455,10 +352,17 @@ class Board:
 
 class Game:
     """Main game controller"""
-    
-    def __init__(self, win, image_loader):
+
+    _blocked_surface = None  # Veil drawn over pieces that cannot move
+
+    def __init__(self, win, image_loader, ai_color=None, worker=None, online=False):
         self.win = win
         self.image_loader = image_loader
+        self.ai_color = ai_color  # Side played by the computer or the remote player, or None
+        self.worker = worker  # EngineWorker searching for the computer, or client.RemoteOpponent
+        self.online = online  # Played against a remote player: no undo or restart
+        self.analysis = False  # Show the endgame table value in the header
+        self.tablebase = None  # Opened on the first analysis
         self._init()
 
     def _init(self):
@@ -467,13 +371,176 @@ class Game:
         self.turn = 'grey'  # Grey starts
         self.valid_moves = {}
         self.must_capture = False
+        self.full_redraw = True  # Next update() redraws the whole window
+        self._drawn_overlay = None
+        self._drawn_header = None
+        self._legal_moves = None  # Legal moves of the side to move, see legal_moves()
+        self._blocked = frozenset()
+        self._drawn_blocked = frozenset()
+        self._saved_moves = []  # Moves already written to GAMES_FILE
+        self.hint = None  # Move suggested with the H key, shown until the turn changes
+        self.hint_search = None  # ParallelSearch looking for that move
 
     def update(self):
-        self.board.draw(self.win)
-        self.draw_selected()
-        self.draw_valid_moves(self.valid_moves)
-        self.draw_turn_indicator()
-        pygame.display.update()
+        """Redraw what changed since the last frame and update only that part of the display"""
+        if self.full_redraw:
+            self.full_redraw = False
+            self.board.dirty.clear()
+            # Background of the window outside the board, when it is wider or taller
+            self.win.fill((40, 40, 60))
+            self.board.draw(self.win)
+            self._drawn_blocked = self.blocked_squares()
+            self.draw_blocked(self._drawn_blocked)
+            self.draw_hint()
+            self.draw_selected()
+            self.draw_valid_moves(self.valid_moves)
+            self.draw_turn_indicator()
+            self._drawn_overlay = self._overlay_state()
+            self._drawn_header = self._header_state()
+            with PROFILER.section('display'):
+                pygame.display.update()
+            return
+
+        # Selection and move markers changed: redraw the old and new squares
+        dirty = self.board.dirty
+        overlay = self._overlay_state()
+        if overlay != self._drawn_overlay:
+            for selected, moves, hint in (self._drawn_overlay, overlay):
+                if selected:
+                    dirty.add(selected)
+                dirty.update(moves)
+                dirty.update(hint)
+            self._drawn_overlay = overlay
+
+        # Pieces that became movable or blocked with the change of turn
+        blocked = self.blocked_squares()
+        if blocked != self._drawn_blocked:
+            dirty.update(blocked ^ self._drawn_blocked)
+            self._drawn_blocked = blocked
+
+        rects = []
+        if dirty:
+            for row, col in dirty:
+                rects.append(self.board.draw_square(self.win, row, col))
+            self.draw_blocked(blocked & dirty)
+            self.draw_hint(dirty)
+            if self.selected and (self.selected.row, self.selected.col) in dirty:
+                self.draw_selected()
+            self.draw_valid_moves({square: skipped for square, skipped in self.valid_moves.items()
+                                   if square in dirty})
+            dirty.clear()
+
+        header = self._header_state()
+        if header != self._drawn_header:
+            self.draw_turn_indicator()
+            rects.append(pygame.Rect(0, 0, WIDTH, HEADER_HEIGHT))
+            self._drawn_header = header
+
+        if rects:
+            with PROFILER.section('display'):
+                pygame.display.update(rects)
+
+    def _overlay_state(self):
+        selected = (self.selected.row, self.selected.col) if self.selected else None
+        return selected, frozenset(self.valid_moves), self._hint_squares()
+
+    def _header_state(self):
+        return (self.turn, self.board.grey_left, self.board.blue_left, self._thinking_dots(),
+                self._analysis_text())
+
+    def _analysis_text(self):
+        """Value of the position in the endgame tables, for the header."""
+        if not self.analysis:
+            return None
+        from tablebase import VALUE_NAMES, open_tablebase
+        if self.tablebase is None:
+            self.tablebase = open_tablebase() or False
+        value = self.tablebase.probe(self.board.position, self.turn) if self.tablebase else None
+        if value is None:
+            return "Analyse: hors des tables"
+        side = "GRIS" if self.turn == 'grey' else "BLEU"
+        return f"Analyse: {VALUE_NAMES[value]} pour {side}"
+
+    def resize(self):
+        """Place the pieces for the new square size (see resize_window) and redraw everything"""
+        pieces = [piece for row in self.board.board for piece in row if piece != 0]
+        # Captured pieces come back on the board with the positions they had
+        pieces.extend(enemy for record in self.board.undo_stack for enemy in record[2])
+        for piece in pieces:
+            piece.calc_pos()
+        self.full_redraw = True
+
+    def invalidate(self, rect):
+        """Redraw, on the next update, what lies under rect (a screen Rect)"""
+        if rect.top < HEADER_HEIGHT:
+            self._drawn_header = None
+        for row in range(max(0, (rect.top - HEADER_HEIGHT) // SQUARE_SIZE),
+                         min(ROWS, (rect.bottom - 1 - HEADER_HEIGHT) // SQUARE_SIZE + 1)):
+            for col in range(max(0, rect.left // SQUARE_SIZE), min(COLS, (rect.right - 1) // SQUARE_SIZE + 1)):
+                self.board.dirty.add((row, col))
+
+    def toggle_analysis(self):
+        self.analysis = not self.analysis
+
+    def _thinking_dots(self):
+        if not self.is_thinking():
+            return None
+        return int(time.monotonic() * 1000) // 400 % 4
+
+    def legal_moves(self):
+        """
+        Legal moves of the side to move, computed once per turn.
+
+        Returns:
+            dict: {from_sq: {(row, col): [captured pieces]}}
+        """
+        if self._legal_moves is None:
+            PROFILER.count('movegen')
+            with PROFILER.section('movegen'):
+                moves = {}
+                for from_sq, to_sq, captured in self.board.legal_moves():
+                    targets = moves.setdefault(from_sq, {})
+                    # Two rafles of the same length may end on the same square;
+                    # the first one found is kept, as in Position.piece_moves
+                    if COORDS[to_sq] not in targets:
+                        targets[COORDS[to_sq]] = [self.board.get_piece(*COORDS[sq]) for sq in squares_of(captured)]
+                self._legal_moves = moves
+                own = self.board.position.grey if self.turn == 'grey' else self.board.position.blue
+                self._blocked = frozenset(COORDS[sq] for sq in squares_of(own) if sq not in moves)
+        return self._legal_moves
+
+    def blocked_squares(self):
+        """Squares of the player's pieces that cannot move this turn."""
+        if self.is_ai_turn():
+            return frozenset()
+        self.legal_moves()
+        return self._blocked
+
+    @classmethod
+    def blocked_surface(cls):
+        if cls._blocked_surface is None:
+            surface = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
+            surface.fill((60, 60, 60, 150))
+            cls._blocked_surface = surface
+        return cls._blocked_surface
+
+    def draw_blocked(self, squares):
+        """Grey out the pieces on squares"""
+        veil = self.blocked_surface()
+        for row, col in squares:
+            self.win.blit(veil, (col * SQUARE_SIZE, HEADER_HEIGHT + row * SQUARE_SIZE))
+
+    def _hint_squares(self):
+        if self.hint is None:
+            return frozenset()
+        return frozenset((COORDS[self.hint[0]], COORDS[self.hint[1]]))
+
+    def draw_hint(self, squares=None):
+        """Frame the start and end squares of the hint (those in squares, if given)"""
+        for row, col in self._hint_squares():
+            if squares is None or (row, col) in squares:
+                pygame.draw.rect(self.win, (0, 200, 255),
+                                 (col * SQUARE_SIZE, HEADER_HEIGHT + row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE), 4)
 
     def draw_selected(self):
         """Highlight the selected piece"""
@@ -486,25 +553,74 @@ class Game:
         # Draw header background
         pygame.draw.rect(self.win, (40, 40, 60), (0, 0, WIDTH, HEADER_HEIGHT))
         
-        font = pygame.font.SysFont('arial', 22, bold=True)
         turn_text = "Tour: GRIS" if self.turn == 'grey' else "Tour: BLEU"
         turn_color = GREY if self.turn == 'grey' else (100, 100, 255)
-        text = font.render(turn_text, True, turn_color)
+        text = render_text(turn_text, turn_color, 22, bold=True)
         
+        if self.is_thinking():
+            dots = "." * self._thinking_dots()
+            if self.hint_search is not None:
+                label = "Recherche d'un conseil"
+            else:
+                label = "L'adversaire réfléchit" if self.online else "L'ordinateur réfléchit"
+            thinking = render_text(label + dots, (255, 200, 0), 22, bold=True)
+            width = get_font('arial', 22, True).size(label + "...")[0]
+            self.win.blit(thinking, (WIDTH - 15 - width, 10))
+
+        analysis = self._analysis_text()
+        if analysis:
+            text_analysis = render_text(analysis, (120, 220, 120), 20, bold=True)
+            self.win.blit(text_analysis, (WIDTH - 15 - text_analysis.get_width(), 36))
+
         # Score
         score_text = f"Gris: {self.board.grey_left} | Bleu: {self.board.blue_left}"
-        score = font.render(score_text, True, WHITE)
+        score = render_text(score_text, WHITE, 22, bold=True)
         
         # Center the text in the header
         self.win.blit(text, (15, 10))
         self.win.blit(score, (15, 35))
 
     def winner(self):
-        return self.board.winner()
+        winner = self.board.winner()
+        if winner is None and self.online:
+            # Game ended by the server: resignation, opponent gone
+            winner = {'grey': "GRIS", 'blue': "BLEU"}.get(self.worker.result())
+        return winner
+
+    def interrupted(self):
+        """Why an online game stopped without a winner (connection lost), else None."""
+        return self.worker.interrupted() if self.online else None
 
     def reset(self):
+        self.cancel_ai()
+        self.cancel_hint()
+        self.save_pdn()
         self._init()
 
+    def save_pdn(self, winner=None, path=GAMES_FILE, draw=False):
+        """
+        Append the game to the PDN archive. winner is the text of
+        Board.winner ("GRIS"/"BLEU") for a finished game, draw is True for
+        a drawn one; without either the game is saved as unfinished.
+        Nothing is written if no move was played or this game was already
+        saved.
+        """
+        moves = self.board.history()
+        if not moves or moves == self._saved_moves:
+            return
+        players = {'grey': "Joueur", 'blue': "Joueur"}
+        if self.ai_color is not None:
+            players[self.ai_color] = "En ligne" if self.online else "Ordinateur"
+        headers = {
+            "Event": "Jeu de Dames",
+            "Date": time.strftime("%Y.%m.%d"),
+            "White": players['grey'],
+            "Black": players['blue'],
+        }
+        results = {"GRIS": 'grey', "BLEU": 'blue'}
+        pdn.write_game(path, moves, headers, results.get(winner), finished=winner is not None or draw)
+        self._saved_moves = moves
+
     def select(self, row, col):
         if self.selected:
             result = self._move(row, col)
@@ -514,23 +630,96 @@ class Game:
 
         piece = self.board.get_piece(row, col)
         if piece != 0 and piece is not None and piece.color == self.turn:
-            self.selected = piece
-            self.valid_moves = self.board.get_valid_moves(piece)
-            return True
+            moves = self.legal_moves().get(square_index(row, col))
+            if moves:
+                self.selected = piece
+                self.valid_moves = moves
+                return True
 
         return False
 
     def _move(self, row, col):
         piece = self.board.get_piece(row, col)
-        if self.selected and (piece == 0 or piece is None) and (row, col) in self.valid_moves:
-            self.board.move(self.selected, row, col)
-            skipped = self.valid_moves[(row, col)]
-            if skipped:
-                self.board.remove(skipped)
-            self.change_turn()
+        # A rafle may end back on the square of the selected piece
+        free = piece == 0 or piece is None or piece is self.selected
+        if self.selected and free and (row, col) in self.valid_moves:
+            captured = 0
+            for skipped in self.valid_moves[(row, col)]:
+                captured |= BIT[square_index(skipped.row, skipped.col)]
+            move = (square_index(self.selected.row, self.selected.col), square_index(row, col), captured)
+            self.play(*move)
+            if self.worker is not None:
+                self.worker.played(move)
+            return True
+        return False
+
+    def undo(self):
+        """Take back the last move, and the computer's reply when playing against it"""
+        if self.online:
+            return  # The server keeps the moves
+        self.cancel_ai()
+        self.cancel_hint()
+        plies = 2 if self.ai_color is not None and not self.is_ai_turn() else 1
+        for _ in range(plies):
+            if self.board.unmake_move() is None:
+                break
+            self.turn = other(self.turn)
+        self._legal_moves = None
+        self.valid_moves = {}
+        self.selected = None
+
+    def is_ai_turn(self):
+        return self.ai_color is not None and self.turn == self.ai_color
+
+    def is_thinking(self):
+        return self.worker is not None and self.worker.thinking or self.hint_search is not None
+
+    def request_hint(self, search):
+        """Look for the best move of the side to move with search (ai.ParallelSearch)"""
+        if self.is_ai_turn() or not self.legal_moves():
+            return
+        self.cancel_hint()
+        self.hint_search = search
+        search.request(self.board.position.copy(), self.turn)
+
+    def update_hint(self):
+        """Show the hint once the search has found it"""
+        if self.hint_search is None:
+            return
+        done, move = self.hint_search.poll()
+        if done:
+            self.hint_search = None
+            self.hint = move
+
+    def cancel_hint(self):
+        if self.hint_search is not None:
+            self.hint_search.cancel()
+            self.hint_search = None
+        self.hint = None
+
+    def update_ai(self):
+        """
+        Start the computer's search, or play its move once it is ready.
+        Returns True when a move was played.
+        """
+        if not self.worker.thinking:
+            self.worker.request(self.board.position.copy(), self.turn)
+            return False
+        done, move = self.worker.poll()
+        if done and move:
+            self.play(*move)
             return True
         return False
 
+    def cancel_ai(self):
+        if self.worker is not None:
+            self.worker.cancel()
+
+    def play(self, from_sq, to_sq, captured):
+        """Apply a move given as square indexes (engine format)"""
+        self.board.make_move(from_sq, to_sq, captured)
+        self.change_turn()
+
     def draw_valid_moves(self, moves):
         for move, skipped in moves.items():
             row, col = move
@@ -540,6 +729,8 @@ class Game:
                               HEADER_HEIGHT + row * SQUARE_SIZE + SQUARE_SIZE // 2), 12)
 
     def change_turn(self):
+        self.cancel_hint()
+        self._legal_moves = None
         self.valid_moves = {}
         self.selected = None
         self.turn = 'blue' if self.turn == 'grey' else 'grey'
@@ -550,66 +741,111 @@ class Game:
 
 class Menu:
     """Main menu system"""
+
+    LAYOUT_HEIGHT = HEIGHT  # Window height the sizes below are given for
     
-    def __init__(self, win):
+    def __init__(self, win, online=False):
         self.win = win
-        self.font_title = pygame.font.SysFont('arial', 60, bold=True)
-        self.font_button = pygame.font.SysFont('arial', 30)
+        self.online = online  # Offer a game on the server given with --server
         self.buttons = []
         self.theme_index = 0
+        self.hovered = None  # Button under the mouse
+        self.needs_redraw = True
+        self.scale = 1.0
         self.create_buttons()
+
+    def _px(self, size):
+        """A size of the menu layout, scaled to the window"""
+        return round(size * self.scale)
+
+    def resize(self):
+        """Scale the menu to the window laid out by resize_window"""
+        self.create_buttons()
+        self.show()
     
     def create_buttons(self):
-        button_width = 300
-        button_height = 60
-        start_y = 250
-        spacing = 100
+        self.scale = HEIGHT / self.LAYOUT_HEIGHT
+        button_width = self._px(300)
+        button_height = self._px(60)
+        start_y = self._px(250)
+        
+        choices = [("Commencer la Partie", "start"), ("Contre l'ordinateur", "start_ai")]
+        if self.online:
+            choices.append(("Partie en ligne", "start_online"))
+        choices.append(("Quitter", "quit"))
+        # Four buttons must still end above the instructions
+        spacing = self._px(100 if len(choices) == 3 else 75)
         
         self.buttons = [
             {
-                "rect": pygame.Rect(WIDTH // 2 - button_width // 2, start_y, button_width, button_height),
-                "text": "Commencer la Partie",
-                "action": "start"
-            },
-            {
-                "rect": pygame.Rect(WIDTH // 2 - button_width // 2, start_y + spacing, button_width, button_height),
-                "text": "Quitter",
-                "action": "quit"
+                "rect": pygame.Rect(WIDTH // 2 - button_width // 2, start_y + i * spacing, button_width, button_height),
+                "text": text,
+                "action": action
             }
+            for i, (text, action) in enumerate(choices)
         ]
     
+    def show(self):
+        """Redraw the whole menu on the next update, e.g. when coming back to it"""
+        self.needs_redraw = True
+        self.hovered = next((button for button in self.buttons
+                             if button["rect"].collidepoint(pygame.mouse.get_pos())), None)
+
+    def update(self):
+        """Draw the menu if something changed since the last frame"""
+        if self.needs_redraw:
+            self.draw()
+
+    def hover(self, pos):
+        """Follow the mouse; only the buttons whose highlight changed are redrawn"""
+        hovered = next((button for button in self.buttons if button["rect"].collidepoint(pos)), None)
+        if hovered is self.hovered:
+            return
+        changed = [button for button in (self.hovered, hovered) if button is not None]
+        self.hovered = hovered
+        if not self.needs_redraw:
+            for button in changed:
+                self.draw_button(button)
+            pygame.display.update([button["rect"] for button in changed])
+
+    def draw_button(self, button):
+        color = (80, 80, 120) if button is self.hovered else (60, 60, 90)
+        pygame.draw.rect(self.win, color, button["rect"], border_radius=self._px(10))
+        pygame.draw.rect(self.win, WHITE, button["rect"], 2, border_radius=self._px(10))
+
+        text = render_text(button["text"], WHITE, self._px(30))
+        self.win.blit(text, (button["rect"].centerx - text.get_width() // 2,
+                             button["rect"].centery - text.get_height() // 2))
+
     def draw(self):
+        self.needs_redraw = False
         self.win.fill((40, 40, 60))
         
         # Title
-        title = self.font_title.render("Jeu de Dames", True, WHITE)
-        self.win.blit(title, (WIDTH // 2 - title.get_width() // 2, 80))
+        title = render_text("Jeu de Dames", WHITE, self._px(60), bold=True)
+        self.win.blit(title, (WIDTH // 2 - title.get_width() // 2, self._px(80)))
         
         # Subtitle
-        subtitle = pygame.font.SysFont('arial', 24).render("International (10x10)", True, GREY)
-        self.win.blit(subtitle, (WIDTH // 2 - subtitle.get_width() // 2, 150))
+        subtitle = render_text("International (10x10)", GREY, self._px(24))
+        self.win.blit(subtitle, (WIDTH // 2 - subtitle.get_width() // 2, self._px(150)))
         
         # Buttons
-        mouse_pos = pygame.mouse.get_pos()
         for button in self.buttons:
-            color = (80, 80, 120) if button["rect"].collidepoint(mouse_pos) else (60, 60, 90)
-            pygame.draw.rect(self.win, color, button["rect"], border_radius=10)
-            pygame.draw.rect(self.win, WHITE, button["rect"], 2, border_radius=10)
-            
-            text = self.font_button.render(button["text"], True, WHITE)
-            self.win.blit(text, (button["rect"].centerx - text.get_width() // 2,
-                                 button["rect"].centery - text.get_height() // 2))
+            self.draw_button(button)
         
         # Instructions
         instructions = [
             "R - Recommencer la partie",
             "M - Retour au menu",
+            "U - Annuler le dernier coup",
+            "A - Analyse des finales",
+            "H - Conseil: meilleur coup",
+            "P - Mesures de performance",
             "Q - Quitter"
         ]
-        small_font = pygame.font.SysFont('arial', 18)
         for i, inst in enumerate(instructions):
-            text = small_font.render(inst, True, GREY)
-            self.win.blit(text, (WIDTH // 2 - text.get_width() // 2, 520 + i * 25))
+            text = render_text(inst, GREY, self._px(18))
+            self.win.blit(text, (WIDTH // 2 - text.get_width() // 2, self._px(560 + i * 25)))
         
         pygame.display.update()
     
@@ -627,83 +863,282 @@ def get_row_col_from_mouse(pos):
     return row, col
 
 
-def show_winner(win, winner):
-    font = pygame.font.SysFont('arial', 50, bold=True)
-    color = (50, 50, 200) if winner == "BLEU" else (100, 100, 100)
-    text = font.render(f"{winner} GAGNE!", True, color)
+def show_winner(win, winner, draw_reason=None, title="PARTIE NULLE"):
+    """
+    End of game box: the winner, or with winner None the title and the
+    reason (rule that drew the game, lost connection...).
+    """
+    if winner is None:
+        text = render_text(title, WHITE, 50, bold=True)
+    else:
+        color = (50, 50, 200) if winner == "BLEU" else (100, 100, 100)
+        text = render_text(f"{winner} GAGNE!", color, 50, bold=True)
     
     # Background rectangle (centered on board area, not header)
     board_center_y = HEADER_HEIGHT + BOARD_SIZE // 2
     rect = pygame.Rect(WIDTH // 2 - text.get_width() // 2 - 30, 
                        board_center_y - text.get_height() // 2 - 30,
-                       text.get_width() + 60, text.get_height() + 80)
+                       text.get_width() + 60, text.get_height() + (105 if draw_reason else 80))
     pygame.draw.rect(win, BLACK, rect, border_radius=15)
     pygame.draw.rect(win, WHITE, rect, 3, border_radius=15)
     win.blit(text, (WIDTH // 2 - text.get_width() // 2, board_center_y - text.get_height() // 2 - 10))
     
     # Restart instruction
-    font_small = pygame.font.SysFont('arial', 20)
-    restart_text = font_small.render("R: Recommencer | M: Menu | Q: Quitter", True, WHITE)
+    restart_text = render_text("R: Recommencer | M: Menu | Q: Quitter", WHITE, 20)
     win.blit(restart_text, (WIDTH // 2 - restart_text.get_width() // 2, board_center_y + 25))
+    if draw_reason:
+        reason_text = render_text(draw_reason, WHITE, 20)
+        win.blit(reason_text, (WIDTH // 2 - reason_text.get_width() // 2, board_center_y + 50))
     
     pygame.display.update()
 
 
+class ProfilerOverlay:
+    """Panel showing the live frame statistics of PROFILER"""
+
+    def __init__(self):
+        self.lines = []
+        self.refreshed = -PROFILER_INTERVAL
+        self.rect = pygame.Rect(0, HEIGHT - 120, 300, 120)
+
+    def draw(self, win):
+        """Draw the panel and update its part of the screen. Returns its rect."""
+        now = time.monotonic() * 1000
+        if now - self.refreshed >= PROFILER_INTERVAL:
+            # Text changes a few times per second only, not every frame
+            self.refreshed = now
+            self.lines = self._lines(PROFILER.stats())
+        # Bottom left corner of the window, which can have been resized
+        self.rect.bottom = HEIGHT
+        pygame.draw.rect(win, (20, 20, 30), self.rect)
+        for i, line in enumerate(self.lines):
+            win.blit(render_text(line, (0, 255, 120), 16, family='consolas'),
+                     (self.rect.x + 8, self.rect.y + 6 + i * 19))
+        pygame.display.update(self.rect)
+        return self.rect
+
+    @staticmethod
+    def _lines(stats):
+        if stats is None:
+            return ["Mesures en cours..."]
+        sections = stats['sections']
+        return [
+            f"FPS {stats['fps']:5.1f}  p50 {stats['p50']:5.2f}ms  p99 {stats['p99']:5.2f}ms",
+            f"evenements {sections.get('events', 0):6.2f}ms",
+            f"dessin     {sections.get('update', 0):6.2f}ms",
+            f"coups      {sections.get('movegen', 0):6.2f}ms  {stats['rates'].get('movegen', 0):5.1f}/s",
+            f"affichage  {sections.get('display', 0):6.2f}ms",
+        ]
+
+
 def main():
-    WIN = pygame.display.set_mode((WIDTH, HEIGHT))
+    parser = argparse.ArgumentParser(description="Jeu de Dames")
+    parser.add_argument("--profile", action="store_true",
+                        help="mesurer des le demarrage et enregistrer un profil cProfile a la sortie")
+    parser.add_argument("--trace", default=os.path.join(BASE_DIR, "profil.json"),
+                        help="fichier JSON des temps par image, ecrit a la sortie si les mesures ont ete activees")
+    parser.add_argument("--fps", type=int, default=FPS_CAP,
+                        help="nombre maximal d'images par seconde (0: sans limite)")
+    parser.add_argument("--server", metavar="HOTE:PORT",
+                        help="serveur de parties en ligne (server.py), ex. localhost:7520")
+    parser.add_argument("--startup-time", action="store_true",
+                        help="afficher les etapes du demarrage (JSON) apres le premier affichage du menu et quitter")
+    args = parser.parse_args()
+    if args.profile:
+        PROFILER.toggle()
+        PROFILER.start_cprofile()
+    startup = {'main': time.time()}
+
+    # Only what the game uses: no audio, joystick or timer initialisation
+    # (pygame.time.get_ticks stays at 0, use time.monotonic)
+    pygame.display.init()
+    pygame.font.init()
+    WIN = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
     pygame.display.set_caption('Jeu de Dames - International')
+    startup['window'] = time.time()
     
     clock = pygame.time.Clock()
     image_loader = ImageLoader()
-    menu = Menu(WIN)
+    menu = Menu(WIN, online=args.server is not None)
     game = None
+    worker = None  # Processus de l'ordinateur, créé à la première partie contre lui
+    hint_search = None  # Recherche parallèle des conseils, créée au premier conseil
     
     state = "menu"  # "menu" or "game"
     run = True
     game_over = False
+    game_end = None  # show_winner arguments of the game that is over
+    overlay = ProfilerOverlay()
+    menu.show()
+    menu.update()
+    startup['menu'] = time.time()
+    # The pieces are read while the player looks at the menu
+    image_loader.preload()
 
-    while run:
-        clock.tick(60)
+    if args.startup_time:
+        image_loader.images
+        startup['images'] = time.time()
+        print(json.dumps(startup), flush=True)
+        pygame.quit()
+        return
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                run = False
+    while run:
+        # Sleep until something happens: input, the computer's move, or the
+        # next step of an animation
+        timeout = IDLE_TIMEOUT
+        if state == "game" and not game_over and (game.is_ai_turn() or game.is_thinking()):
+            timeout = POLL_INTERVAL
+        if PROFILER.enabled:
+            timeout = min(timeout, PROFILER_INTERVAL)
+        first = pygame.event.wait(timeout)
+        events = [] if first.type == pygame.NOEVENT else [first] + pygame.event.get()
 
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_q:
+        PROFILER.start_frame()
+        with PROFILER.section('events'):
+            for event in events:
+                if event.type == pygame.QUIT:
                     run = False
-                elif event.key == pygame.K_r and state == "game":
-                    game.reset()
-                    game_over = False
-                elif event.key == pygame.K_m and state == "game":
-                    state = "menu"
-                    game_over = False
-
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if state == "menu":
-                    action = menu.handle_click(event.pos)
-                    if action == "start":
-                        game = Game(WIN, image_loader)
-                        state = "game"
-                        game_over = False
-                    elif action == "quit":
+
+                if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    if state == "game":
+                        game.full_redraw = True
+                    else:
+                        menu.needs_redraw = True
+
+                if event.type == pygame.VIDEORESIZE:
+                    resize_window(event.w, event.h, image_loader)
+                    menu.resize()
+                    if game is not None:
+                        game.resize()
+
+                if event.type == pygame.MOUSEMOTION and state == "menu":
+                    menu.hover(event.pos)
+
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_q:
                         run = False
-                elif state == "game" and not game_over:
-                    pos = pygame.mouse.get_pos()
-                    row, col = get_row_col_from_mouse(pos)
-                    if 0 <= row < ROWS and 0 <= col < COLS:
-                        game.select(row, col)
-
-        if state == "menu":
-            menu.draw()
-        elif state == "game":
-            if not game_over:
-                game.update()
-                winner = game.winner()
-                if winner:
-                    game_over = True
-                    show_winner(WIN, winner)
+                    elif event.key == pygame.K_r and state == "game" and not game.online:
+                        game.reset()
+                        game_over = False
+                    elif event.key == pygame.K_u and state == "game":
+                        game.undo()
+                        if game_over:
+                            # Effacer le message de fin de partie
+                            game.full_redraw = True
+                            game_over = False
+                    elif event.key == pygame.K_a and state == "game":
+                        game.toggle_analysis()
+                    elif event.key == pygame.K_h and state == "game" and not game_over:
+                        if hint_search is None:
+                            from ai import ParallelSearch
+                            from book import DEFAULT_BOOK
+                            hint_search = ParallelSearch(time_limit=HINT_TIME, book_path=DEFAULT_BOOK)
+                        game.request_hint(hint_search)
+                    elif event.key == pygame.K_p:
+                        PROFILER.toggle()
+                        if not PROFILER.enabled:
+                            # Effacer le panneau de mesures
+                            if state == "game":
+                                game.full_redraw = True
+                            else:
+                                menu.needs_redraw = True
+                    elif event.key == pygame.K_m and state == "game":
+                        game.cancel_ai()
+                        game.cancel_hint()
+                        game.save_pdn()
+                        if game.online:
+                            game.worker.close()
+                        state = "menu"
+                        menu.show()
+                        game_over = False
+
+                if event.type == pygame.MOUSEBUTTONDOWN:
+                    if state == "menu":
+                        action = menu.handle_click(event.pos)
+                        if action in ("start", "start_ai"):
+                            # L'ordinateur joue les bleus, le joueur commence avec les gris
+                            ai_color = 'blue' if action == "start_ai" else None
+                            if ai_color and worker is None:
+                                from ai import EngineWorker
+                                from book import DEFAULT_BOOK
+                                from tablebase import TABLE_DIR
+                                worker = EngineWorker(book_path=DEFAULT_BOOK, tablebase_dir=TABLE_DIR)
+                            game = Game(WIN, image_loader, ai_color, worker)
+                            state = "game"
+                            game_over = False
+                        elif action == "start_online":
+                            from client import RemoteOpponent
+                            host, _, port = args.server.rpartition(":")
+                            try:
+                                remote = RemoteOpponent(host or "localhost", int(port))
+                            except (OSError, ValueError) as e:
+                                print(f"Warning: Could not join a game on {args.server}: {e}")
+                            else:
+                                game = Game(WIN, image_loader, remote.color, remote, online=True)
+                                # Moves played before we joined
+                                for move in remote.moves:
+                                    game.play(*move)
+                                state = "game"
+                                game_over = False
+                        elif action == "quit":
+                            run = False
+                    elif state == "game" and not game_over and not game.is_ai_turn():
+                        row, col = get_row_col_from_mouse(event.pos)
+                        if 0 <= row < ROWS and 0 <= col < COLS:
+                            game.select(row, col)
+
+        with PROFILER.section('update'):
+            if state == "menu":
+                menu.update()
+            elif state == "game":
+                if not game_over:
+                    game.update_hint()
+                    while True:
+                        game.update()
+                        winner = game.winner()
+                        draw_reason = None if winner else game.board.draw_reason()
+                        if winner or draw_reason:
+                            game_over = True
+                            game.save_pdn(winner, draw=draw_reason is not None)
+                            game_end = (winner, draw_reason)
+                            show_winner(WIN, *game_end)
+                            break
+                        interrupted = game.interrupted()
+                        if interrupted:
+                            # Saved as unfinished; M or Q leave the game
+                            game_over = True
+                            game.save_pdn()
+                            game_end = (None, interrupted, "PARTIE INTERROMPUE")
+                            show_winner(WIN, *game_end)
+                            break
+                        # A reply played now is drawn in this pass, not after
+                        # the next wait (up to IDLE_TIMEOUT on the player's turn)
+                        if not (game.is_ai_turn() and game.update_ai()):
+                            break
+                elif game.full_redraw:
+                    # Window resized or uncovered: the end of game box goes back over the board
+                    game.update()
+                    show_winner(WIN, *game_end)
+        PROFILER.end_frame()
+
+        if PROFILER.enabled:
+            rect = overlay.draw(WIN)
+            if state == "game":
+                game.invalidate(rect)
+        if args.fps:
+            clock.tick(args.fps)
 
+    if PROFILER.trace:
+        PROFILER.dump_json(args.trace)
+    PROFILER.dump_cprofile(os.path.splitext(args.trace)[0] + ".prof")
+    if state == "game":
+        game.save_pdn()
+        if game.online:
+            game.worker.close()
+    if worker is not None:
+        worker.close()
+    if hint_search is not None:
+        hint_search.close()
     pygame.quit()
     sys.exit()
 
@@ -0,0 +1,413 @@
+"""
+PDN (Portable Draughts Notation) game records.
+
+- write_game / game_to_pdn export a game played from the starting layout.
+- iter_games streams an archive game by game, remembering the byte offset
+  of each game, so multi-gigabyte files are never loaded in memory.
+- replay rebuilds the positions of a game with the rules of Position.moves.
+- build_index writes a sorted on-disk index from position hash (Zobrist,
+  side to move included) to game offsets; PositionIndex searches it with a
+  binary search over a memory-mapped file.
+- position_fen / parse_fen write and read single positions in the FEN
+  notation of PDN: W:W31-50:B1-20 is the starting layout with White to
+  move, K marks queens (W:WK46,28:BK3).
+
+Squares use the standard numbering 1-50 (our square index + 1). Grey
+moves first and plays the role of White, blue plays Black.
+
+Usage:
+    python pdn.py index parties.pdn
+    python pdn.py find parties.pdn 32-28 19-23
+"""
+
+import argparse
+import heapq
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+
+from position import Position, GREY, BLUE, BIT, ROW_MASK, NUM_SQUARES, squares_of, other
+
+RESULTS = {GREY: "2-0", BLUE: "0-2", None: "1-1"}
+RESULT_TOKENS = {"2-0", "0-2", "1-1", "*"}
+
+_TAG = re.compile(rb'^\s*\[(\w+)\s+"(.*)"\]\s*$')
+_MOVE = re.compile(r'^(\d+)([-x])(\d+)((?:x\d+)*)')
+_COMMENTS = re.compile(r'\{[^}]*\}|\([^()]*\)|;[^\n]*')
+
+FEN_COLORS = {GREY: "W", BLUE: "B"}
+_FEN_SIDES = {"W": GREY, "B": BLUE}
+# A pawn on its promotion row would already be a queen
+_PROMOTION_ROWS = {GREY: ROW_MASK[0], BLUE: ROW_MASK[-1]}
+
+INDEX_RECORD = struct.Struct('<QQ')  # position hash, game offset
+INDEX_SUFFIX = ".idx"
+
+
+def move_text(from_sq, to_sq, captured):
+    """PDN notation of a move: 32-28 or 28x19."""
+    return f"{from_sq + 1}{'x' if captured else '-'}{to_sq + 1}"
+
+
+def game_to_pdn(moves, headers=None, winner=None, finished=True):
+    """
+    PDN text of a game played from the starting layout.
+
+    Args:
+        moves: list of (from_sq, to_sq, captured_mask)
+        headers: extra tags, e.g. {"Event": "...", "White": "..."}
+        winner: GREY, BLUE or None (draw); ignored if finished is False
+    """
+    result = RESULTS[winner] if finished else "*"
+    tags = {"Event": "", "White": "", "Black": "", "GameType": "20"}
+    tags.update(headers or {})
+    tags["Result"] = result
+
+    lines = [f'[{name} "{value}"]' for name, value in tags.items()]
+    lines.append("")
+    words = []
+    for ply, move in enumerate(moves):
+        if ply % 2 == 0:
+            words.append(f"{ply // 2 + 1}.")
+        words.append(move_text(*move))
+    words.append(result)
+
+    # Movetext wrapped at 80 columns
+    line = ""
+    for word in words:
+        if line and len(line) + 1 + len(word) > 80:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    lines.append(line)
+    return "\n".join(lines) + "\n\n"
+
+
+def write_game(path, moves, headers=None, winner=None, finished=True):
+    """Append a game to a PDN file."""
+    with open(path, "a", encoding="utf-8") as out:
+        out.write(game_to_pdn(moves, headers, winner, finished))
+
+
+def _fen_squares(pieces, kings):
+    # Ascending squares, runs of three or more of the same kind as ranges
+    items = []
+    squares = list(squares_of(pieces))
+    i = 0
+    while i < len(squares):
+        king = bool(kings & BIT[squares[i]])
+        j = i
+        while (j + 1 < len(squares) and squares[j + 1] == squares[j] + 1
+               and bool(kings & BIT[squares[j + 1]]) == king):
+            j += 1
+        prefix = "K" if king else ""
+        if j - i >= 2:
+            items.append(f"{prefix}{squares[i] + 1}-{squares[j] + 1}")
+        else:
+            items.extend(f"{prefix}{sq + 1}" for sq in squares[i:j + 1])
+        i = j + 1
+    return ",".join(items)
+
+
+def position_fen(position, color):
+    """FEN of a position with color to move, e.g. W:W31-50:B1-20."""
+    return (f"{FEN_COLORS[color]}:W{_fen_squares(position.grey, position.kings)}"
+            f":B{_fen_squares(position.blue, position.kings)}")
+
+
+def parse_fen(text):
+    """
+    Position and color to move of a FEN string.
+
+    Accepts ranges (31-50), a K before queens (or a range of queens), any
+    order of the two sides and a final dot. Raises ValueError for a
+    malformed string or an impossible position (square out of the board or
+    taken twice, pawn on its promotion row).
+    """
+    fields = text.strip().rstrip(".").replace(" ", "").split(":")
+    if len(fields) < 3 or fields[0].upper() not in _FEN_SIDES:
+        raise ValueError(f"FEN invalide: {text!r}")
+    masks = {GREY: 0, BLUE: 0}
+    kings = 0
+    for field in fields[1:]:
+        side = _FEN_SIDES.get(field[:1].upper())
+        if side is None:
+            continue  # Extra fields of some programs (move counters...)
+        for item in filter(None, field[1:].split(",")):
+            king = item[:1].upper() == "K"
+            first, _, last = item[king:].partition("-")
+            try:
+                first = int(first)
+                last = int(last) if last else first
+                if last < first:
+                    raise ValueError
+            except ValueError:
+                raise ValueError(f"FEN invalide: {item!r}") from None
+            for number in (first, last):
+                if not 1 <= number <= NUM_SQUARES:
+                    raise ValueError(f"case hors du damier: {number}")
+            # Squares first..last (PDN numbers start at 1) as one mask
+            bits = (1 << last) - (1 << (first - 1))
+            taken = (masks[GREY] | masks[BLUE]) & bits
+            if taken:
+                raise ValueError(f"case occupee deux fois: {next(squares_of(taken)) + 1}")
+            masks[side] |= bits
+            if king:
+                kings |= bits
+    for side, pieces in masks.items():
+        if pieces & ~kings & _PROMOTION_ROWS[side]:
+            raise ValueError("pion sur sa ligne de promotion")
+    return Position(masks[GREY], masks[BLUE], kings), _FEN_SIDES[fields[0].upper()]
+
+
+class PDNGame:
+    """One game of an archive: its offset, tags and raw movetext"""
+
+    __slots__ = ('offset', 'headers', 'movetext')
+
+    def __init__(self, offset, headers, movetext):
+        self.offset = offset
+        self.headers = headers
+        self.movetext = movetext
+
+    def tokens(self):
+        """Move tokens of the main line (comments and variations removed)."""
+        text = self.movetext
+        previous = None
+        while previous != text:
+            previous = text
+            text = _COMMENTS.sub(" ", text)
+        moves = []
+        for word in text.split():
+            if word in RESULT_TOKENS:
+                break
+            word = word.split(".")[-1]  # "12.32-28" or "12..."
+            if _MOVE.match(word):
+                moves.append(word)
+        return moves
+
+    def __repr__(self):
+        return f"PDNGame(offset={self.offset}, tags={len(self.headers)})"
+
+
+_RESULT_BYTES = {token.encode() for token in RESULT_TOKENS}
+
+
+def _scan(archive, offset):
+    # Split the lines of an open archive into games; offset is the current
+    # position of the file, counted again line by line
+    start = None
+    headers = {}
+    movetext = []
+
+    def game():
+        return PDNGame(start, headers, b"".join(movetext).decode("utf-8", "replace"))
+
+    for line in archive:
+        tag = _TAG.match(line)
+        if tag:
+            # A tag after movetext starts the next game
+            if movetext:
+                yield game()
+                start, headers, movetext = None, {}, []
+            if start is None:
+                start = offset
+            headers[tag.group(1).decode()] = tag.group(2).decode("utf-8", "replace")
+        elif line.strip():
+            if start is None:
+                start = offset
+            movetext.append(line)
+            if line.split()[-1] in _RESULT_BYTES:
+                yield game()
+                start, headers, movetext = None, {}, []
+        offset += len(line)
+    if movetext or headers:
+        yield game()
+
+
+def iter_games(path):
+    """
+    Stream the games of a PDN archive, one PDNGame at a time.
+
+    Only the current game is kept in memory; offset is the byte position
+    of its first line, for read_game_at.
+    """
+    with open(path, "rb") as archive:
+        yield from _scan(archive, 0)
+
+
+def read_game_at(path, offset):
+    """The game starting at a byte offset of an archive, or None."""
+    with open(path, "rb") as archive:
+        archive.seek(offset)
+        return next(_scan(archive, offset), None)
+
+
+def parse_move(position, color, token):
+    """The legal move of color matching a PDN move token, or None."""
+    match = _MOVE.match(token)
+    if not match:
+        return None
+    from_sq = int(match.group(1)) - 1
+    to_sq = int((match.group(4).split("x")[-1] if match.group(4) else match.group(3))) - 1
+    for move in position.moves(color):
+        # Rafles with the same ends are told apart only by their path,
+        # which is not recorded; the first one is taken
+        if move[0] == from_sq and move[1] == to_sq:
+            return move
+    return None
+
+
+def replay(game):
+    """
+    Yield (position, color to move, move) for every move of a game, then
+    (final position, color to move, None). The position object is reused:
+    copy it to keep it. Stops at the first illegal move.
+    """
+    position = Position.initial()
+    color = GREY
+    for token in game.tokens():
+        move = parse_move(position, color, token)
+        if move is None:
+            break
+        yield position, color, move
+        position.make_move(*move)
+        color = other(color)
+    yield position, color, None
+
+
+def index_path(pdn_path):
+    return pdn_path + INDEX_SUFFIX
+
+
+def build_index(pdn_path, chunk_records=1 << 20):
+    """
+    Write the position index of an archive next to it (archive.pdn.idx).
+
+    Records (hash, offset) are sorted in chunks of chunk_records in memory,
+    spilled to temporary files and merged, so memory stays bounded
+    whatever the size of the archive. Returns the number of records.
+    """
+    runs = []
+    chunk = []
+
+    def spill():
+        chunk.sort()
+        run = tempfile.TemporaryFile()
+        run.write(b"".join(INDEX_RECORD.pack(*record) for record in chunk))
+        run.seek(0)
+        runs.append(run)
+        chunk.clear()
+
+    for game in iter_games(pdn_path):
+        seen = set()
+        for position, color, _ in replay(game):
+            key = position.zobrist(color)
+            if key not in seen:
+                seen.add(key)
+                chunk.append((key, game.offset))
+        if len(chunk) >= chunk_records:
+            spill()
+    if chunk or not runs:
+        spill()
+
+    count = 0
+    with open(index_path(pdn_path), "wb") as out:
+        for record in heapq.merge(*(_read_run(run) for run in runs)):
+            out.write(INDEX_RECORD.pack(*record))
+            count += 1
+    for run in runs:
+        run.close()
+    return count
+
+
+def _read_run(run):
+    size = INDEX_RECORD.size
+    while True:
+        data = run.read(size * 4096)
+        if not data:
+            return
+        yield from INDEX_RECORD.iter_unpack(data)
+
+
+class PositionIndex:
+    """Memory-mapped position index; lookups are binary searches"""
+
+    def __init__(self, pdn_path):
+        self.file = open(index_path(pdn_path), "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.count = size // INDEX_RECORD.size
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def _key_at(self, i):
+        return INDEX_RECORD.unpack_from(self.data, i * INDEX_RECORD.size)[0]
+
+    def offsets(self, key):
+        """Offsets of every game that reached the position hash key."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        result = []
+        while low < self.count:
+            found, offset = INDEX_RECORD.unpack_from(self.data, low * INDEX_RECORD.size)
+            if found != key:
+                break
+            result.append(offset)
+            low += 1
+        return result
+
+    def close(self):
+        if self.count:
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archives de parties PDN")
+    commands = parser.add_subparsers(dest="command", required=True)
+    index_cmd = commands.add_parser("index", help="construire l'index des positions")
+    index_cmd.add_argument("archive")
+    find_cmd = commands.add_parser("find", help="parties passant par la position obtenue apres ces coups")
+    find_cmd.add_argument("archive")
+    find_cmd.add_argument("moves", nargs="*", help="coups depuis le depart, ex. 32-28 19-23")
+    args = parser.parse_args()
+
+    if args.command == "index":
+        count = build_index(args.archive)
+        print(f"{count} positions indexees dans {index_path(args.archive)}")
+        return
+
+    position = Position.initial()
+    color = GREY
+    for token in args.moves:
+        move = parse_move(position, color, token)
+        if move is None:
+            sys.exit(f"coup illegal: {token}")
+        position.make_move(*move)
+        color = other(color)
+    with PositionIndex(args.archive) as index:
+        offsets = index.offsets(position.zobrist(color))
+    for offset in offsets:
+        game = read_game_at(args.archive, offset)
+        white = game.headers.get("White", "?")
+        black = game.headers.get("Black", "?")
+        print(f"{offset:>12}  {white} - {black}  {game.headers.get('Result', '*')}")
+    print(f"{len(offsets)} partie(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Perft benchmark and correctness check for the move generator.
+
+Counts the leaf nodes of the move tree to a given depth and compares the
+counts with reference values published for international draughts by
+other engines, so that a rules bug shows up as a mismatch. The source of
+each reference row is given next to it. The hand-built capture positions
+have no published counts: they are only timed, and their counts are
+printed without a check.
+
+Usage:
+    python perft.py                     # every position, default depths
+    python perft.py -p rafle_dame -d 5  # one position, given depth
+    python perft.py --divide            # per-move breakdown at the root
+"""
+
+import argparse
+import sys
+import time
+
+import pdn
+from position import Position, GREY, BLUE, BIT, COORDS, other
+
+
+def _mask(squares):
+    # Squares are given in standard draughts numbering (1-50)
+    mask = 0
+    for number in squares:
+        mask |= BIT[number - 1]
+    return mask
+
+
+def make_position(grey=(), blue=(), grey_kings=(), blue_kings=()):
+    """Build a Position from square numbers (1-50, as in PDN)."""
+    kings = _mask(grey_kings) | _mask(blue_kings)
+    return Position(_mask(grey) | _mask(grey_kings), _mask(blue) | _mask(blue_kings), kings)
+
+
+# name: (position, side to move, default depth)
+POSITIONS = {
+    "depart": (Position.initial(), GREY, 6),
+    # Woldouby position, a classic test of the capture rules (pawns only)
+    "woldouby": (*pdn.parse_fen("W:W25,27,28,30,32,33,34,35,37,38:B12,13,14,16,18,19,21,23,24,26"), 9),
+    # Position of Ed Gilbert (Kingsrow): queens on both sides, long captures
+    "gilbert": (*pdn.parse_fen("B:BK17,K24:W6,9,10,11,20,21,22,23,30,K31,33,37,41,42,43,44,46"), 6),
+    # Grey queen in the corner facing a long rafle over scattered pawns
+    "rafle_dame": (make_position(grey=(44, 49), grey_kings=(46,),
+                                 blue=(6, 9, 17, 18, 31, 32, 42)), GREY, 8),
+    # Pawn chains forward and backward, plus a queen on each side
+    "chaines_mixtes": (make_position(grey=(32, 37, 41, 44), grey_kings=(50,),
+                                     blue=(7, 12, 19, 20, 28, 30, 31), blue_kings=(5,)), GREY, 8),
+    # Queen endgame: long slides everywhere, captures at a distance
+    "finale_dames": (make_position(grey=(41,), grey_kings=(26, 45),
+                                   blue=(10,), blue_kings=(3, 23)), BLUE, 6),
+}
+
+# Leaf counts per depth, starting at depth 1, from published perft tables
+# (not from this generator): the hand-built positions above have none
+REFERENCE = {
+    # Aart Bik, perft for international draughts; also in Rein Halbersma's
+    # DCTL test suite and Ed Gilbert's Kingsrow results
+    "depart": [9, 81, 658, 4265, 27117, 167140, 1049442],
+    # Aart Bik and DCTL test suite (R. Halbersma)
+    "woldouby": [6, 12, 30, 73, 215, 590, 1944, 6269, 22369, 88050, 377436],
+    # Ed Gilbert, published with the position; DCTL test suite (R. Halbersma)
+    "gilbert": [14, 55, 1168, 5432, 87195, 629010, 9041010],
+}
+
+
+def perft(position, color, depth):
+    """Number of leaf nodes of the move tree at the given depth."""
+    if depth == 0:
+        return 1
+    moves = position.moves(color)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    next_color = other(color)
+    for from_sq, to_sq, captured in moves:
+        position.make_move(from_sq, to_sq, captured)
+        nodes += perft(position, next_color, depth - 1)
+        position.unmake_move()
+    return nodes
+
+
+def divide(position, color, depth):
+    """Leaf counts per root move, as {(from_sq, to_sq, captured): nodes}."""
+    counts = {}
+    for move in position.moves(color):
+        position.make_move(*move)
+        counts[move] = perft(position, other(color), depth - 1)
+        position.unmake_move()
+    return counts
+
+
+def move_label(from_sq, to_sq, captured):
+    separator = 'x' if captured else '-'
+    return f"{from_sq + 1}{separator}{to_sq + 1}"
+
+
+def run(name, depth, show_divide=False):
+    """Run perft on one stored position. Returns True if it matches the reference."""
+    position, color, _ = POSITIONS[name]
+    expected = REFERENCE.get(name, [])
+    ok = True
+    for d in range(1, depth + 1):
+        start = time.perf_counter()
+        nodes = perft(position, color, d)
+        elapsed = time.perf_counter() - start
+        speed = nodes / elapsed if elapsed > 0 else float('inf')
+        if d <= len(expected):
+            status = "OK" if nodes == expected[d - 1] else f"ERREUR (attendu {expected[d - 1]})"
+            ok = ok and nodes == expected[d - 1]
+        else:
+            status = "pas de reference"
+        print(f"{name:16} depth {d}: {nodes:>10} nodes  {elapsed:8.3f}s  {speed:>10.0f} nodes/s  {status}")
+    if show_divide:
+        for move, nodes in divide(position, color, depth).items():
+            print(f"    {move_label(*move):8} {nodes}")
+    return ok
+
+
+def show(position):
+    """Text diagram of a position (g/b pawns, G/B queens)."""
+    lines = []
+    for row in range(10):
+        cells = []
+        for col in range(10):
+            cells.append('.' if (row + col) % 2 == 0 else '_')
+        lines.append(cells)
+    for sq, (row, col) in enumerate(COORDS):
+        color = position.color_at(sq)
+        if color:
+            letter = 'g' if color == GREY else 'b'
+            lines[row][col] = letter.upper() if position.is_king(sq) else letter
+    return "\n".join(" ".join(cells) for cells in lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft du generateur de coups")
+    parser.add_argument("-p", "--position", choices=sorted(POSITIONS), action="append",
+                        help="position a tester (par defaut: toutes)")
+    parser.add_argument("-d", "--depth", type=int, help="profondeur maximale")
+    parser.add_argument("--divide", action="store_true", help="detail par coup a la racine")
+    parser.add_argument("--show", action="store_true", help="afficher la position")
+    args = parser.parse_args()
+
+    ok = True
+    for name in args.position or POSITIONS:
+        if args.show:
+            print(show(POSITIONS[name][0]))
+        depth = args.depth or POSITIONS[name][2]
+        ok = run(name, depth, args.divide) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
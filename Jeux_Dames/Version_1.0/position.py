@@ -0,0 +1,364 @@
+"""
+Compact position core for 10x10 international draughts.
+
+Only the 50 dark squares are playable, so a position is stored as three
+integer bitmasks over those squares instead of a 10x10 grid of objects:
+
+    grey  - squares holding a grey piece (pawn or queen)
+    blue  - squares holding a blue piece (pawn or queen)
+    kings - squares holding a queen (either colour)
+
+Squares are numbered 0..49 row by row from the top of the board, so the
+square index of a dark square (row, col) is row * 5 + col // 2.
+"""
+
+import random
+
+ROWS, COLS = 10, 10
+NUM_SQUARES = 50
+
+GREY = 'grey'
+BLUE = 'blue'
+
+# Diagonal directions as (row_direction, col_direction).
+# Index 0 and 1 go up the board (towards row 0), 2 and 3 go down.
+DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+FORWARD = {GREY: (0, 1), BLUE: (2, 3)}  # Grey moves up, blue moves down
+PROMOTION_ROW = {GREY: 0, BLUE: ROWS - 1}
+
+
+def other(color):
+    """The opposite colour."""
+    return BLUE if color == GREY else GREY
+
+
+def square_index(row, col):
+    """Return the square index of (row, col), or -1 for light/outside squares."""
+    if 0 <= row < ROWS and 0 <= col < COLS and (row + col) % 2 == 1:
+        return row * 5 + col // 2
+    return -1
+
+
+def square_coords(sq):
+    """Return the (row, col) of a square index."""
+    row = sq // 5
+    return row, 2 * (sq % 5) + (1 if row % 2 == 0 else 0)
+
+
+COORDS = tuple(square_coords(sq) for sq in range(NUM_SQUARES))
+BIT = tuple(1 << sq for sq in range(NUM_SQUARES))
+ROW_MASK = tuple(sum(BIT[sq] for sq in range(row * 5, row * 5 + 5)) for row in range(ROWS))
+
+
+def _build_rays():
+    # RAYS[sq][d] lists the squares met when walking from sq in direction d
+    rays = []
+    for sq in range(NUM_SQUARES):
+        row, col = COORDS[sq]
+        per_dir = []
+        for row_dir, col_dir in DIRECTIONS:
+            ray = []
+            r, c = row + row_dir, col + col_dir
+            while 0 <= r < ROWS and 0 <= c < COLS:
+                ray.append(square_index(r, c))
+                r += row_dir
+                c += col_dir
+            per_dir.append(tuple(ray))
+        rays.append(tuple(per_dir))
+    return tuple(rays)
+
+
+RAYS = _build_rays()
+# Squares diagonally next to sq: a pawn with no enemy there cannot capture
+NEIGHBOURS = tuple(sum(BIT[ray[0]] for ray in rays if ray) for rays in RAYS)
+
+
+def _build_zobrist():
+    # Fixed seed: hash keys must be the same in every process and every run
+    rng = random.Random(20251210)
+    pieces = tuple(tuple(rng.getrandbits(64) for _ in range(NUM_SQUARES)) for _ in range(4))
+    return pieces, rng.getrandbits(64)
+
+
+# ZOBRIST[kind][sq] with kind 0 grey pawn, 1 grey queen, 2 blue pawn, 3 blue queen
+ZOBRIST, ZOBRIST_BLUE_TO_MOVE = _build_zobrist()
+
+
+def squares_of(mask):
+    """Yield the square indexes set in a bitmask, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class Position:
+    """Bitboard representation of the pieces on the board"""
+
+    __slots__ = ('grey', 'blue', 'kings', 'undo')
+
+    def __init__(self, grey=0, blue=0, kings=0):
+        self.grey = grey
+        self.blue = blue
+        self.kings = kings
+        # Masks saved by make_move, three per move, flat so that no
+        # record object is created per move
+        self.undo = []
+
+    @classmethod
+    def initial(cls):
+        """Starting layout: blue on the 4 top rows, grey on the 4 bottom rows."""
+        blue = sum(ROW_MASK[row] for row in range(4))
+        grey = sum(ROW_MASK[row] for row in range(6, ROWS))
+        return cls(grey, blue, 0)
+
+    def copy(self):
+        return Position(self.grey, self.blue, self.kings)
+
+    def __eq__(self, other):
+        return (isinstance(other, Position) and self.grey == other.grey
+                and self.blue == other.blue and self.kings == other.kings)
+
+    def __hash__(self):
+        return hash((self.grey, self.blue, self.kings))
+
+    def __repr__(self):
+        return f"Position(grey={self.grey:#x}, blue={self.blue:#x}, kings={self.kings:#x})"
+
+    def _sides(self, color):
+        """Return (own, enemy) masks for the given colour."""
+        if color == GREY:
+            return self.grey, self.blue
+        return self.blue, self.grey
+
+    def zobrist(self, color):
+        """64-bit Zobrist hash of the position with color to move."""
+        key = ZOBRIST_BLUE_TO_MOVE if color == BLUE else 0
+        kings = self.kings
+        for kind, mask in enumerate((self.grey & ~kings, self.grey & kings,
+                                     self.blue & ~kings, self.blue & kings)):
+            table = ZOBRIST[kind]
+            for sq in squares_of(mask):
+                key ^= table[sq]
+        return key
+
+    def piece_kind(self, sq):
+        """Zobrist piece kind of the piece on sq (see ZOBRIST)."""
+        bit = BIT[sq]
+        return (0 if self.grey & bit else 2) + (1 if self.kings & bit else 0)
+
+    def color_at(self, sq):
+        bit = BIT[sq]
+        if self.grey & bit:
+            return GREY
+        if self.blue & bit:
+            return BLUE
+        return None
+
+    def is_king(self, sq):
+        return bool(self.kings & BIT[sq])
+
+    def count(self, color):
+        return (self.grey if color == GREY else self.blue).bit_count()
+
+    def king_count(self, color):
+        return ((self.grey if color == GREY else self.blue) & self.kings).bit_count()
+
+    def move(self, from_sq, to_sq):
+        """Move the piece on from_sq to to_sq. Returns True if it was promoted."""
+        if from_sq == to_sq:
+            # A rafle can end on the square it started from
+            return False
+        from_bit = BIT[from_sq]
+        to_bit = BIT[to_sq]
+        if self.grey & from_bit:
+            color = GREY
+            self.grey ^= from_bit | to_bit
+        else:
+            color = BLUE
+            self.blue ^= from_bit | to_bit
+        if self.kings & from_bit:
+            self.kings ^= from_bit | to_bit
+            return False
+        if to_sq // 5 == PROMOTION_ROW[color]:
+            self.kings |= to_bit
+            return True
+        return False
+
+    def remove(self, mask):
+        """Remove every piece whose square is set in mask."""
+        keep = ~mask
+        self.grey &= keep
+        self.blue &= keep
+        self.kings &= keep
+
+    def make_move(self, from_sq, to_sq, captured):
+        """Play a move so that unmake_move can take it back. Returns True on promotion."""
+        undo = self.undo
+        undo.append(self.grey)
+        undo.append(self.blue)
+        undo.append(self.kings)
+        promoted = self.move(from_sq, to_sq)
+        if captured:
+            self.remove(captured)
+        return promoted
+
+    def unmake_move(self):
+        """Take back the last move played with make_move."""
+        undo = self.undo
+        self.kings = undo.pop()
+        self.blue = undo.pop()
+        self.grey = undo.pop()
+
+    def piece_moves(self, sq):
+        """
+        Legal moves for the piece on sq. The whole side is taken into
+        account: if another piece can capture more, this one cannot move.
+
+        Returns:
+            dict: {landing_square: captured_mask}
+        """
+        moves = {}
+        for from_sq, to_sq, captured in self.moves(self.color_at(sq)):
+            # Two rafles of the same length may end on the same square;
+            # the first one found is kept
+            if from_sq == sq and to_sq not in moves:
+                moves[to_sq] = captured
+        return moves
+
+    def moves(self, color):
+        """
+        Legal (from_sq, to_sq, captured_mask) moves for the side color.
+
+        Capturing is mandatory and the side must play a sequence that takes
+        the most pieces. Only when nothing can be captured are the simple
+        moves returned.
+        """
+        own, enemy = self._sides(color)
+        kings = self.kings
+        best = 0
+        captures = []
+        for sq in squares_of(own):
+            if not (kings & BIT[sq] or enemy & NEIGHBOURS[sq]):
+                continue
+            count, ends = self._find_captures(sq, own, enemy)
+            if count > best:
+                best = count
+                captures = [(sq, to_sq, captured) for to_sq, captured in ends]
+            elif count and count == best:
+                captures.extend((sq, to_sq, captured) for to_sq, captured in ends)
+        if best:
+            return captures
+        return self._simple_moves(color, own, enemy)
+
+    def _simple_moves(self, color, own, enemy):
+        """Non-capturing moves: pawns one square forward, queens any distance."""
+        occupied = own | enemy
+        forward = FORWARD[color]
+        moves = []
+        for sq in squares_of(own):
+            if self.kings & BIT[sq]:
+                for ray in RAYS[sq]:
+                    for target in ray:
+                        if occupied & BIT[target]:
+                            break
+                        moves.append((sq, target, 0))
+            else:
+                for d in forward:
+                    ray = RAYS[sq][d]
+                    if ray and not occupied & BIT[ray[0]]:
+                        moves.append((sq, ray[0], 0))
+        return moves
+
+    def _find_captures(self, sq, own, enemy):
+        """
+        Search every capture sequence of the piece on sq.
+
+        The piece is lifted from its starting square. Captured pieces stay on
+        the board until the move is over: they block the diagonal and cannot
+        be jumped twice. The search state is (square, captured mask) and is
+        memoized, so sequences reaching the same state are explored once and
+        sequences taking the same pieces to the same square are merged.
+
+        Returns:
+            (count, ends): the largest number of pieces that can be taken and
+            the set of (landing_square, captured_mask) that take that many.
+        """
+        bit = BIT[sq]
+        occupied = (own | enemy) ^ bit
+        if self.kings & bit:
+            return self._queen_find_captures(sq, 0, occupied, enemy, {})
+        return self._pawn_find_captures(sq, 0, occupied, enemy, {})
+
+    def _pawn_find_captures(self, sq, captured, occupied, enemy, memo):
+        """Pawn captures: jump an adjacent enemy, in all 4 directions."""
+        key = captured << 6 | sq
+        result = memo.get(key)
+        if result is not None:
+            return result
+
+        best = captured.bit_count()
+        found = None
+        for ray in RAYS[sq]:
+            if len(ray) < 2:
+                continue
+            enemy_bit = BIT[ray[0]]
+            if not enemy & enemy_bit or captured & enemy_bit or occupied & BIT[ray[1]]:
+                continue
+            count, ends = self._pawn_find_captures(ray[1], captured | enemy_bit, occupied, enemy, memo)
+            if count > best:
+                best = count
+                found = [ends]
+            elif count == best:
+                found.append(ends)
+
+        result = (best, _merge_ends(sq, captured, found))
+        memo[key] = result
+        return result
+
+    def _queen_find_captures(self, sq, captured, occupied, enemy, memo):
+        """
+        Queen captures: jump an enemy piece at any distance and land on any
+        empty square behind it.
+        """
+        key = captured << 6 | sq
+        result = memo.get(key)
+        if result is not None:
+            return result
+
+        best = captured.bit_count()
+        found = None
+        for ray in RAYS[sq]:
+            # Slide to the first occupied square of the diagonal
+            i = 0
+            last = len(ray) - 1
+            while i < last and not occupied & BIT[ray[i]]:
+                i += 1
+            if i >= last:
+                continue
+            enemy_bit = BIT[ray[i]]
+            if not enemy & enemy_bit or captured & enemy_bit:
+                continue
+            caps = captured | enemy_bit
+            for landing in ray[i + 1:]:
+                if occupied & BIT[landing]:
+                    break
+                count, ends = self._queen_find_captures(landing, caps, occupied, enemy, memo)
+                if count > best:
+                    best = count
+                    found = [ends]
+                elif count == best:
+                    found.append(ends)
+
+        result = (best, _merge_ends(sq, captured, found))
+        memo[key] = result
+        return result
+
+
+def _merge_ends(sq, captured, found):
+    # End states of the longest continuations, or this square if none
+    if found is None:
+        return frozenset(((sq, captured),))
+    if len(found) == 1:
+        return found[0]
+    return frozenset().union(*found)
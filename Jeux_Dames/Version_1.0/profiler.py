@@ -0,0 +1,147 @@
+"""
+Frame-time instrumentation for the GUI.
+
+FrameProfiler splits the time of each frame into named sections (event
+handling, drawing, move generation, display update...). Nested sections
+are exclusive: time spent in movegen inside update is counted for movegen
+only. The last frames are kept to give the FPS, the median and 99th
+percentile frame time and per-section averages, and can be written to a
+JSON trace. A cProfile run of the whole session can be added on demand.
+
+When the profiler is disabled, section() returns a shared no-op context
+manager, so instrumented code costs almost nothing.
+"""
+
+import contextlib
+import json
+import time
+from collections import deque
+
+SECTIONS = ('events', 'update', 'movegen', 'display')
+
+
+class FrameProfiler:
+    """Per-frame timings, split by section"""
+
+    def __init__(self, history=600, trace_length=36000):
+        self.enabled = False
+        # (start, total, {section: seconds}, {counter: calls}) per frame
+        self.frames = deque(maxlen=history)
+        self.counters = {}  # Calls counted in the current frame
+        self.trace = deque(maxlen=trace_length)  # Last frames recorded, for dump_json
+        self._current = {}
+        self._stack = []
+        self._mark = 0.0
+        self._frame_start = None
+        self._profile = None
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self._frame_start = None
+
+    def start_frame(self):
+        if not self.enabled:
+            return
+        self._frame_start = time.perf_counter()
+        self._current = dict.fromkeys(SECTIONS, 0.0)
+        self.counters = {}
+        self._stack = []
+
+    def end_frame(self):
+        if not self.enabled or self._frame_start is None:
+            return
+        total = time.perf_counter() - self._frame_start
+        record = (self._frame_start, total, self._current, self.counters)
+        self.frames.append(record)
+        self.trace.append(record)
+        self._frame_start = None
+
+    def section(self, name):
+        """Context manager timing a section of the current frame."""
+        if not self.enabled or self._frame_start is None:
+            return _NO_SECTION
+        return self._section(name)
+
+    @contextlib.contextmanager
+    def _section(self, name):
+        self._begin(name)
+        try:
+            yield
+        finally:
+            self._end()
+
+    def _begin(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            parent = self._stack[-1]
+            self._current[parent] = self._current.get(parent, 0.0) + now - self._mark
+        self._stack.append(name)
+        self._mark = now
+
+    def _end(self):
+        if not self._stack:
+            return
+        now = time.perf_counter()
+        name = self._stack.pop()
+        self._current[name] = self._current.get(name, 0.0) + now - self._mark
+        self._mark = now
+
+    def count(self, name):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def stats(self):
+        """
+        Summary of the kept frames.
+
+        Returns:
+            dict with fps, p50 and p99 (ms), sections {name: average ms}
+            and rates {counter: calls per second}, or None without frames.
+        """
+        if len(self.frames) < 2:
+            return None
+        frames = list(self.frames)
+        elapsed = frames[-1][0] - frames[0][0]
+        totals = sorted(frame[1] for frame in frames)
+        sections = {}
+        rates = {}
+        for _, _, times, counters in frames:
+            for name, seconds in times.items():
+                sections[name] = sections.get(name, 0.0) + seconds
+            for name, calls in counters.items():
+                rates[name] = rates.get(name, 0) + calls
+        return {
+            'fps': (len(frames) - 1) / elapsed if elapsed > 0 else 0.0,
+            'p50': totals[len(totals) // 2] * 1000,
+            'p99': totals[min(len(totals) - 1, len(totals) * 99 // 100)] * 1000,
+            'sections': {name: seconds * 1000 / len(frames) for name, seconds in sections.items()},
+            'rates': {name: calls / elapsed if elapsed > 0 else 0.0 for name, calls in rates.items()},
+        }
+
+    def dump_json(self, path):
+        """Write every recorded frame: start time, total and sections, in milliseconds."""
+        if not self.trace:
+            return
+        origin = self.trace[0][0]
+        frames = [{'t': round((start - origin) * 1000, 3),
+                   'total': round(total * 1000, 3),
+                   'sections': {name: round(seconds * 1000, 3) for name, seconds in times.items()},
+                   'counters': counters}
+                  for start, total, times, counters in self.trace]
+        with open(path, "w") as out:
+            json.dump({'frames': frames, 'summary': self.stats()}, out, indent=1)
+
+    def start_cprofile(self):
+        import cProfile  # Only for --profile, kept out of the start-up imports
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def dump_cprofile(self, path):
+        """Stop cProfile and write its stats (read them with pstats)."""
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(path)
+            self._profile = None
+
+
+_NO_SECTION = contextlib.nullcontext()
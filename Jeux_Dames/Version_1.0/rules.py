@@ -0,0 +1,292 @@
+"""
+Rules of the game without any display: board state, move generation,
+promotion, winner and draw detection.
+
+Draws follow the FMJD rules: the same position with the same side to move
+three times, 25 moves each with only queens moving and no capture, and
+the endings against a lone queen (16 moves each with three pieces, 5 with
+two or one). Board keeps the hash of every position since the start and
+the counters of these rules up to date in make_move, so checking for a
+draw costs no scan of the board.
+
+This module only depends on position.py, so batch analysis, self-play
+workers and tools can import it without pygame. The GUI in main.py
+subclasses Piece and Board to add drawing.
+"""
+
+from position import (Position, GREY, NUM_SQUARES, ROWS, COLS, COORDS, BIT, ZOBRIST, ZOBRIST_BLUE_TO_MOVE,
+                      square_index, squares_of, other)
+
+REPETITIONS = 3  # Occurrences of a position that draw
+QUEEN_MOVES_PLIES = 50  # 25 moves each of queens only, without capture
+
+
+def winner(position, color=None, moves=None):
+    """
+    "GRIS" or "BLEU" when the other side has no piece left, else None.
+    Given color, the side to move, also when that side is blocked (a side
+    that cannot move loses); moves are its legal moves if already known.
+    """
+    if position.count('grey') <= 0:
+        return "BLEU"
+    elif position.count('blue') <= 0:
+        return "GRIS"
+    if color is not None and not (position.moves(color) if moves is None else moves):
+        return "BLEU" if color == GREY else "GRIS"
+    return None
+
+
+def endgame_limit(position):
+    """
+    Plies before a draw in an ending against a lone queen: 32 (16 moves
+    each) against three pieces with a queen, 10 against two or one piece
+    with a queen. None in other endings.
+    """
+    for strong, weak in ((position.grey, position.blue), (position.blue, position.grey)):
+        if weak.bit_count() == 1 and weak & position.kings and strong & position.kings:
+            pieces = strong.bit_count()
+            if pieces == 3:
+                return 32
+            if pieces <= 2:
+                return 10
+    return None
+
+
+class Piece:
+    """Represents a game piece (pawn or queen)"""
+
+    # No per-instance __dict__: a board holds 40 of these, the GUI more
+    __slots__ = ('row', 'col', 'color', 'king')
+
+    def __init__(self, row, col, color):
+        self.row = row
+        self.col = col
+        self.color = color  # 'blue' or 'grey'
+        self.king = False
+
+    def make_king(self):
+        self.king = True
+
+    def move(self, row, col):
+        self.row = row
+        self.col = col
+
+    def __repr__(self):
+        return f"Piece({self.row}, {self.col}, {self.color}, king={self.king})"
+
+
+class Board:
+    """Represents the game board (grid of Piece views over a bitboard Position)"""
+
+    def __init__(self, position=None, turn=GREY):
+        """
+        Starting layout, or the given Position with turn to move (e.g.
+        Board(*pdn.parse_fen(text))).
+        """
+        self.board = []
+        self.position = Position()
+        self.undo_stack = []  # (piece, move, captured pieces, promoted) per move
+        if position is None:
+            self.create_board()
+        else:
+            self.set_position(position, turn)
+
+    @property
+    def grey_left(self):
+        return self.position.count('grey')
+
+    @property
+    def blue_left(self):
+        return self.position.count('blue')
+
+    @property
+    def grey_kings(self):
+        return self.position.king_count('grey')
+
+    @property
+    def blue_kings(self):
+        return self.position.king_count('blue')
+
+    def new_piece(self, row, col, color):
+        """Create the Piece object shown on (row, col); overridden by the GUI."""
+        return Piece(row, col, color)
+
+    def create_board(self):
+        self.set_position(Position.initial())
+
+    def set_position(self, position, turn=GREY):
+        """Replace the pieces on the board by those of a Position, turn to move."""
+        self.position = position
+        self.turn = turn
+        self.undo_stack = []
+        self.board = [[0] * COLS for _ in range(ROWS)]
+        self._restart_history()
+
+        # Pièces uniquement sur les cases noires (où row + col est impair)
+        for sq in range(NUM_SQUARES):
+            color = position.color_at(sq)
+            if color is not None:
+                row, col = COORDS[sq]
+                piece = self.new_piece(row, col, color)
+                if position.is_king(sq):
+                    piece.make_king()
+                self.board[row][col] = piece
+
+    def move(self, piece, row, col):
+        promoted = self.position.move(square_index(piece.row, piece.col), square_index(row, col))
+
+        # Swap positions
+        self.board[piece.row][piece.col], self.board[row][col] = \
+            self.board[row][col], self.board[piece.row][piece.col]
+        piece.move(row, col)
+
+        if promoted:
+            piece.make_king()
+        self.turn = other(piece.color)
+        self._edited()
+
+    def get_piece(self, row, col):
+        if 0 <= row < ROWS and 0 <= col < COLS:
+            return self.board[row][col]
+        return None
+
+    def remove(self, pieces):
+        mask = 0
+        for piece in pieces:
+            if piece != 0:
+                self.board[piece.row][piece.col] = 0
+                mask |= BIT[square_index(piece.row, piece.col)]
+        self.position.remove(mask)
+        self._edited()
+
+    def _edited(self):
+        """
+        After move or remove, which change the board outside make_move: the
+        moves before the edit can no longer be taken back (unmake_move would
+        restore bitboards that no longer match the grid), and the draw rules
+        start again from the edited position.
+        """
+        self.undo_stack = []
+        del self.position.undo[:]
+        self._restart_history()
+
+    def _restart_history(self):
+        """Start the draw rules from the current position."""
+        self._moves = None  # Legal moves of the side to move, see legal_moves()
+        # Hash of every position since this one, how many times each was
+        # seen, and (queen plies, ending plies, ending limit) per position
+        key = self.position.zobrist(self.turn)
+        self.keys = [key]
+        self.seen = {key: 1}
+        self.counters = [(0, 0, endgame_limit(self.position))]
+
+    def winner(self):
+        """
+        "GRIS" or "BLEU" when the other side has no piece left or the side
+        to move is blocked (a side that cannot move loses), else None.
+        """
+        return winner(self.position, self.turn, self.legal_moves())
+
+    def draw_reason(self):
+        """Why the game is drawn (text shown to the players), or None."""
+        if self.seen[self.keys[-1]] >= REPETITIONS:
+            return "position repetee trois fois"
+        queen_plies, endgame_plies, limit = self.counters[-1]
+        if queen_plies >= QUEEN_MOVES_PLIES:
+            return "25 coups de dames sans prise"
+        if limit is not None and endgame_plies >= limit:
+            return f"{limit // 2} coups dans la finale"
+        return None
+
+    def legal_moves(self):
+        """Legal moves of the side to move (Position.moves), generated once per position."""
+        if self._moves is None:
+            self._moves = self.position.moves(self.turn)
+        return self._moves
+
+    def get_valid_moves(self, piece):
+        """Get all valid moves for a piece, including captures"""
+        moves = {}  # {(row, col): [skipped_pieces]}
+        sq = square_index(piece.row, piece.col)
+        for to_sq, captured in self.position.piece_moves(sq).items():
+            moves[COORDS[to_sq]] = [self.get_piece(*COORDS[s]) for s in squares_of(captured)]
+        return moves
+
+    def make_move(self, from_sq, to_sq, captured):
+        """
+        Play a move given as square indexes (format of Position.moves) and
+        record it on the undo stack. Returns True if the piece was promoted.
+        """
+        position = self.position
+        piece = self.get_piece(*COORDS[from_sq])
+        skipped = [self.get_piece(*COORDS[sq]) for sq in squares_of(captured)]
+        # Hash of the next position: only the squares of the move change
+        key = self.keys[-1] ^ ZOBRIST_BLUE_TO_MOVE
+        kind = position.piece_kind(from_sq)
+        key ^= ZOBRIST[kind][from_sq]
+        for enemy in skipped:
+            sq = square_index(enemy.row, enemy.col)
+            key ^= ZOBRIST[position.piece_kind(sq)][sq]
+        promoted = position.make_move(from_sq, to_sq, captured)
+        key ^= ZOBRIST[kind + promoted][to_sq]
+
+        row, col = COORDS[to_sq]
+        for enemy in skipped:
+            self.board[enemy.row][enemy.col] = 0
+        self.board[piece.row][piece.col] = 0
+        self.board[row][col] = piece
+        piece.move(row, col)
+        if promoted:
+            piece.make_king()
+
+        self.undo_stack.append((piece, (from_sq, to_sq, captured), skipped, promoted))
+        self.turn = other(self.turn)
+        self._moves = None
+        self.keys.append(key)
+        self.seen[key] = self.seen.get(key, 0) + 1
+        queen_plies, endgame_plies, limit = self.counters[-1]
+        if captured or promoted:
+            self.counters.append((0, 0, endgame_limit(position)))
+        else:
+            # kind is odd for a queen
+            self.counters.append((queen_plies + 1 if kind & 1 else 0, endgame_plies + 1, limit))
+        return promoted
+
+    def unmake_move(self):
+        """
+        Take back the last move played with make_move.
+
+        Returns:
+            (piece, from_sq, to_sq, captured pieces), or None if there is
+            nothing to take back.
+        """
+        if not self.undo_stack:
+            return None
+        piece, (from_sq, to_sq, _), skipped, promoted = self.undo_stack.pop()
+        self.position.unmake_move()
+        self.turn = other(self.turn)
+        self._moves = None
+        key = self.keys.pop()
+        if self.seen[key] == 1:
+            del self.seen[key]
+        else:
+            self.seen[key] -= 1
+        self.counters.pop()
+
+        row, col = COORDS[from_sq]
+        self.board[piece.row][piece.col] = 0
+        self.board[row][col] = piece
+        piece.move(row, col)
+        if promoted:
+            piece.king = False
+        for enemy in skipped:
+            self.board[enemy.row][enemy.col] = enemy
+        return piece, from_sq, to_sq, skipped
+
+    def history(self):
+        """Moves played since the position was set, as (from_sq, to_sq, captured_mask)."""
+        return [record[1] for record in self.undo_stack]
+
+    def play(self, from_sq, to_sq, captured):
+        """Apply a move given as square indexes (format of Position.moves)"""
+        self.make_move(from_sq, to_sq, captured)
@@ -0,0 +1,305 @@
+"""
+Game server: many matches at once over TCP, run by one asyncio loop.
+
+Every game is checked with rules.Board and Position.moves, so clients can
+only play legal moves in turn. The protocol is one JSON object per line
+(UTF-8) in both directions; a connection takes part in one game at a time,
+as a player or a spectator.
+
+Client requests ("op"):
+    {"op": "play"}                join the oldest game waiting for an
+                                  opponent, or create one
+    {"op": "new"}                 create a game and wait for someone to join it
+    {"op": "join", "game": 12}    take the free side of game 12
+    {"op": "watch", "game": 12}   follow game 12 as a spectator
+    {"op": "move", "m": [31, 27, 0]}
+                                  play (from_sq, to_sq, captured_mask), the
+                                  format of Position.moves
+    {"op": "resign"}
+
+Server events ("ev"):
+    {"ev": "state", "game": 12, "color": "blue", "turn": "grey", "moves": [...]}
+        sent once on joining: the moves played so far (color is null for
+        a spectator)
+    {"ev": "start"}               both players are there
+    {"ev": "move", "ply": 7, "m": [31, 27, 0]}
+        a move was played, sent to both players and the spectators. Only
+        the move travels, clients apply it to their own copy of the board;
+        ply (moves played, this one included) lets them check they missed
+        nothing.
+    {"ev": "end", "winner": "grey", "reason": "..."}
+    {"ev": "error", "msg": "..."}
+
+A player who disconnects or resigns loses; a side that cannot move loses.
+The draw rules of rules.Board (repetition, queen moves, endings against a
+lone queen) end a game with a null winner.
+
+Usage:
+    python server.py --port 7520
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+
+import rules
+from position import GREY, BLUE, other
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7520
+# A client that stops reading is dropped once this much output is queued for it
+MAX_BUFFER = 1 << 20
+
+
+def encode(message):
+    """One protocol line."""
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+class Connection:
+    """A connected client and the game it takes part in"""
+
+    __slots__ = ('writer', 'game', 'color')
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.game = None
+        self.color = None  # GREY or BLUE for a player, None for a spectator
+
+    def send(self, data):
+        """Queue an encoded line; never waits for a slow client."""
+        transport = self.writer.transport
+        if transport.is_closing():
+            return
+        if transport.get_write_buffer_size() > MAX_BUFFER:
+            transport.abort()
+            return
+        self.writer.write(data)
+
+    def error(self, text):
+        self.send(encode({"ev": "error", "msg": text}))
+
+
+class ServerGame:
+    """One match: the board, its players and spectators"""
+
+    def __init__(self, game_id):
+        self.id = game_id
+        self.board = rules.Board()
+        self.turn = GREY
+        self.players = {}  # color -> Connection
+        self.spectators = set()
+        self._legal = None  # Legal moves of the side to move, as a set
+
+    def legal_moves(self):
+        if self._legal is None:
+            self._legal = set(self.board.legal_moves())
+        return self._legal
+
+    def free_color(self):
+        return next((color for color in (GREY, BLUE) if color not in self.players), None)
+
+    def connections(self):
+        return itertools.chain(self.players.values(), self.spectators)
+
+    def broadcast(self, message):
+        data = encode(message)  # Encoded once for every recipient
+        for connection in self.connections():
+            connection.send(data)
+
+    def state(self, color):
+        return {"ev": "state", "game": self.id, "color": color, "turn": self.turn,
+                "moves": [list(move) for move in self.board.history()]}
+
+    def play(self, move):
+        """Play a legal move of the side to move and tell everyone."""
+        self.board.make_move(*move)
+        self.turn = other(self.turn)
+        self._legal = None
+        self.broadcast({"ev": "move", "ply": len(self.board.undo_stack), "m": list(move)})
+
+
+class GameServer:
+    """Accepts connections and dispatches their requests to the games"""
+
+    def __init__(self):
+        self.games = {}  # id -> ServerGame still being played
+        self.waiting = {}  # id -> ServerGame with one player, oldest first
+        self.connections = 0
+        self.moves = 0  # Moves played since the start
+        self._ids = itertools.count(1)
+        self._handlers = {
+            "play": self.op_play,
+            "new": self.op_new,
+            "join": self.op_join,
+            "watch": self.op_watch,
+            "move": self.op_move,
+            "resign": self.op_resign,
+        }
+
+    async def handle(self, reader, writer):
+        """Serve one client until it disconnects."""
+        connection = Connection(writer)
+        self.connections += 1
+        try:
+            async for line in reader:
+                try:
+                    message = json.loads(line)
+                    handler = self._handlers[message["op"]]
+                except (ValueError, TypeError, KeyError, RecursionError):
+                    # RecursionError: thousands of nested brackets
+                    connection.error("requete invalide")
+                    continue
+                try:
+                    handler(connection, message)
+                except Exception as e:
+                    # A request the checks missed must not end the connection
+                    print(f"Warning: request {message['op']!r} failed: {e!r}")
+                    connection.error("requete invalide")
+                # Wait here when this client reads slower than it writes
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass  # Disconnected, or a line longer than the stream limit
+        finally:
+            self.connections -= 1
+            self.leave(connection)
+            writer.close()
+
+    def create_game(self):
+        game = ServerGame(next(self._ids))
+        self.games[game.id] = game
+        return game
+
+    def seat(self, connection, game, color):
+        """Put a connection in a game, as a player or spectator (color None)."""
+        self.leave(connection)
+        connection.game = game
+        connection.color = color
+        if color is None:
+            game.spectators.add(connection)
+        else:
+            game.players[color] = connection
+        connection.send(encode(game.state(color)))
+        if color is not None:
+            if game.free_color() is None:
+                self.waiting.pop(game.id, None)
+                game.broadcast({"ev": "start"})
+            else:
+                self.waiting[game.id] = game
+
+    def op_play(self, connection, message):
+        game = next(iter(self.waiting.values()), None)
+        if game is None or connection.game is game:
+            game = self.create_game()
+        self.seat(connection, game, game.free_color())
+
+    def op_new(self, connection, message):
+        game = self.create_game()
+        self.seat(connection, game, GREY)
+
+    def find_game(self, message):
+        """Game named by a join or watch request, or None."""
+        game_id = message.get("game")
+        # Any JSON value may come here: a list or an object cannot be a dict
+        # key, and true/false would pass for ids 1 and 0
+        return self.games.get(game_id) if type(game_id) is int else None
+
+    def op_join(self, connection, message):
+        game = self.find_game(message)
+        if game is None:
+            connection.error("partie inconnue")
+        elif game.free_color() is None:
+            connection.error("partie complete")
+        else:
+            self.seat(connection, game, game.free_color())
+
+    def op_watch(self, connection, message):
+        game = self.find_game(message)
+        if game is None:
+            connection.error("partie inconnue")
+        else:
+            self.seat(connection, game, None)
+
+    def op_move(self, connection, message):
+        game = connection.game
+        if game is None or connection.color is None:
+            connection.error("aucune partie en cours")
+            return
+        if connection.color != game.turn:
+            connection.error("ce n'est pas votre tour")
+            return
+        move = message.get("m")
+        # Exactly three JSON integers: no float (1e400 is infinite), no boolean
+        if type(move) is not list or len(move) != 3 or any(type(value) is not int for value in move):
+            connection.error("coup invalide")
+            return
+        move = tuple(move)
+        if move not in game.legal_moves():
+            connection.error("coup illegal")
+            return
+        game.play(move)
+        self.moves += 1
+        if not game.legal_moves():
+            # No piece left or no legal move: the side to move loses
+            self.finish(game, other(game.turn), "plus de coup possible")
+            return
+        draw_reason = game.board.draw_reason()
+        if draw_reason is not None:
+            self.finish(game, None, f"partie nulle: {draw_reason}")
+
+    def op_resign(self, connection, message):
+        if connection.game is not None and connection.color is not None:
+            self.finish(connection.game, other(connection.color), "abandon")
+
+    def finish(self, game, winner, reason):
+        """End a game, tell everyone and forget it."""
+        game.broadcast({"ev": "end", "winner": winner, "reason": reason})
+        for connection in list(game.connections()):
+            connection.game = None
+            connection.color = None
+        self.games.pop(game.id, None)
+        self.waiting.pop(game.id, None)
+
+    def leave(self, connection):
+        """Take a connection out of its game; a player leaving a match loses it."""
+        game = connection.game
+        if game is None:
+            return
+        connection.game = None
+        if connection.color is None:
+            game.spectators.discard(connection)
+            return
+        color = connection.color
+        connection.color = None
+        del game.players[color]
+        if game.players:
+            self.finish(game, other(color), "abandon")
+        else:
+            # Nobody else was playing in it
+            self.finish(game, None, "partie abandonnee")
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    server = GameServer()
+    listener = await asyncio.start_server(server.handle, host, port, backlog=1024)
+    address = listener.sockets[0].getsockname()
+    # load_test.py reads the port from this line
+    print(f"Serveur en ecoute sur {address[0]}:{address[1]}", flush=True)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur de parties en reseau")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="0: port libre choisi par le systeme")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+"""
+Endgame tablebases: win, draw or loss of every position with few pieces.
+
+A table covers one material signature (grey pawns, grey queens, blue
+pawns, blue queens) for both sides to move. Positions are indexed by the
+colex rank of the squares of each group of pieces, so a table is a dense
+array and a probe is a little arithmetic. Values use 2 bits per position
+and are stored zlib-compressed, one file per signature (e.g. 0201.wdl for
+two grey queens against one blue queen).
+
+Generation follows the rules of Position.moves (mandatory maximum
+capture, long-range queens, backward pawn captures). A first pass resolves
+every move that leaves the signature (captures and promotions) with the
+smaller tables already on disk; the wins and losses found are then
+propagated backwards with un-moves inside the signature (retrograde
+analysis). Positions never resolved are draws. A side that cannot move
+loses. Signatures of the same size and pawn count do not depend on each
+other and are solved in parallel.
+
+Pure Python: up to 3 pieces takes a couple of minutes on one core, 4
+pieces about an hour per core.
+
+Usage:
+    python tablebase.py generate --pieces 3 -j 4
+"""
+
+import argparse
+import functools
+import itertools
+import multiprocessing
+import os
+import struct
+import time
+import zlib
+from array import array
+from collections import deque
+from math import comb
+
+from position import (Position, GREY, BLUE, BIT, RAYS, ROW_MASK, NUM_SQUARES,
+                      squares_of)
+
+TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebases")
+
+# Values, from the point of view of the side to move
+UNKNOWN, WIN, LOSS, DRAW = 0, 1, 2, 3
+VALUE_NAMES = {WIN: "gain", LOSS: "perte", DRAW: "nulle"}
+
+MAGIC = b"WDL1"
+HEADER = struct.Struct('<4sBBBBI')  # magic, signature, positions per side
+
+# Pawns can never stand on their promotion row
+_FORBIDDEN = (ROW_MASK[0], 0, ROW_MASK[-1], 0)
+# Squares behind a pawn, where it came from: grey pawns move up, blue down
+_BACKWARD = {GREY: (2, 3), BLUE: (0, 1)}
+
+
+@functools.lru_cache(maxsize=None)
+def _masks_by_rank(k):
+    """Masks of the k-square subsets of the board, in colex rank order."""
+    masks = [sum(BIT[sq] for sq in squares) for squares in itertools.combinations(range(NUM_SQUARES), k)]
+    masks.sort(key=_rank)
+    return masks
+
+
+_BINOM = tuple(tuple(comb(n, k) for k in range(NUM_SQUARES + 1)) for n in range(NUM_SQUARES + 1))
+
+
+def _rank(mask):
+    rank = 0
+    for i, sq in enumerate(squares_of(mask)):
+        rank += _BINOM[sq][i + 1]
+    return rank
+
+
+def signature(grey, blue, kings):
+    """Material signature (grey pawns, grey queens, blue pawns, blue queens)."""
+    return ((grey & ~kings).bit_count(), (grey & kings).bit_count(),
+            (blue & ~kings).bit_count(), (blue & kings).bit_count())
+
+
+def table_size(sig):
+    size = 1
+    for count in sig:
+        size *= _BINOM[NUM_SQUARES][count]
+    return size
+
+
+def table_index(sig, grey, blue, kings):
+    """Index of a position in the table of its signature."""
+    index = 0
+    for count, mask in zip(sig, (grey & ~kings, grey & kings, blue & ~kings, blue & kings)):
+        index = index * _BINOM[NUM_SQUARES][count] + _rank(mask)
+    return index
+
+
+def table_masks(sig, index):
+    """
+    (grey, blue, kings) of the position at index, or None when the index
+    does not stand for a legal placement (pieces on the same square, pawn
+    on its promotion row).
+    """
+    groups = [0, 0, 0, 0]
+    for group in (3, 2, 1, 0):
+        count = sig[group]
+        index, rank = divmod(index, _BINOM[NUM_SQUARES][count])
+        groups[group] = _masks_by_rank(count)[rank]
+    seen = 0
+    for group, mask in enumerate(groups):
+        if seen & mask or mask & _FORBIDDEN[group]:
+            return None
+        seen |= mask
+    grey_pawns, grey_kings, blue_pawns, blue_kings = groups
+    return grey_pawns | grey_kings, blue_pawns | blue_kings, grey_kings | blue_kings
+
+
+def table_path(directory, sig):
+    return os.path.join(directory, "".join(map(str, sig)) + ".wdl")
+
+
+def signatures(pieces):
+    """Signatures with at most pieces pieces, in an order where every table
+    comes after those it depends on (fewer pieces, or fewer pawns)."""
+    result = []
+    for sig in itertools.product(range(pieces), repeat=4):
+        total = sum(sig)
+        if total <= pieces and sig[0] + sig[1] and sig[2] + sig[3]:
+            result.append(sig)
+    result.sort(key=lambda sig: (sum(sig), sig[0] + sig[2], sig))
+    return result
+
+
+class Tablebase:
+    """
+    Probes the tables of a directory.
+
+    Decompressed tables and probe results are kept in LRU caches, so the
+    engine can probe every node of an endgame search.
+    """
+
+    def __init__(self, directory=TABLE_DIR, tables=32, cache_size=1 << 16):
+        self.directory = directory
+        self.max_pieces = 0
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.endswith(".wdl") and len(name) == 8 and name[:4].isdigit():
+                    self.max_pieces = max(self.max_pieces, sum(map(int, name[:4])))
+        self._table = functools.lru_cache(maxsize=tables)(self._load)
+        self._probe = functools.lru_cache(maxsize=cache_size)(self._probe_masks)
+
+    def _load(self, sig):
+        path = table_path(self.directory, sig)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as table:
+            magic, *stored, size = HEADER.unpack(table.read(HEADER.size))
+            if magic != MAGIC or tuple(stored) != sig:
+                raise ValueError(f"{path}: not a table of {sig}")
+            return size, zlib.decompress(table.read())
+
+    def probe(self, position, color):
+        """WIN, DRAW or LOSS for color to move, or None outside the tables."""
+        return self._probe(position.grey, position.blue, position.kings, color)
+
+    def _probe_masks(self, grey, blue, kings, color):
+        own, enemy = (grey, blue) if color == GREY else (blue, grey)
+        if not own:
+            return LOSS
+        if not enemy:
+            return WIN
+        if (grey | blue).bit_count() > self.max_pieces:
+            return None
+        sig = signature(grey, blue, kings)
+        table = self._table(sig)
+        if table is None:
+            return None
+        size, data = table
+        entry = table_index(sig, grey, blue, kings) + (size if color == BLUE else 0)
+        return data[entry >> 2] >> ((entry & 3) << 1) & 3 or None
+
+    def cache_clear(self):
+        self._table.cache_clear()
+        self._probe.cache_clear()
+
+
+def open_tablebase(directory=TABLE_DIR):
+    """The tables of directory, or None when there are none."""
+    tablebase = Tablebase(directory)
+    return tablebase if tablebase.max_pieces else None
+
+
+def _pack(values):
+    # 4 values per byte, first value in the low bits
+    values = values + bytes(-len(values) % 4)
+    return bytes(a | b << 2 | c << 4 | d << 6
+                 for a, b, c, d in zip(values[0::4], values[1::4], values[2::4], values[3::4]))
+
+
+def _predecessors(sig, grey, blue, kings, mover):
+    """Indexes of the positions from which a quiet move of mover, keeping the
+    signature, leads to (grey, blue, kings)."""
+    own = grey if mover == GREY else blue
+    empty = ~(grey | blue)
+    for sq in squares_of(own):
+        bit = BIT[sq]
+        if kings & bit:
+            targets = []
+            for ray in RAYS[sq]:
+                for to_sq in ray:
+                    if not empty & BIT[to_sq]:
+                        break
+                    targets.append(to_sq)
+        else:
+            targets = [RAYS[sq][d][0] for d in _BACKWARD[mover] if RAYS[sq][d] and empty & BIT[RAYS[sq][d][0]]]
+        for from_sq in targets:
+            moved = bit | BIT[from_sq]
+            if mover == GREY:
+                yield table_index(sig, grey ^ moved, blue, kings ^ moved if kings & bit else kings)
+            else:
+                yield table_index(sig, grey, blue ^ moved, kings ^ moved if kings & bit else kings)
+
+
+def solve(sig, directory=TABLE_DIR):
+    """Compute the table of a signature and write it. Returns (sig, size, seconds)."""
+    start = time.perf_counter()
+    size = table_size(sig)
+    smaller = Tablebase(directory, cache_size=1 << 18)
+    smaller.max_pieces = sum(sig)
+    colors = (GREY, BLUE)
+    values = (bytearray(size), bytearray(size))
+    pending = (array('H', bytes(2 * size)), array('H', bytes(2 * size)))
+    draw_option = (bytearray(size), bytearray(size))
+    resolved = deque()
+
+    # First pass: moves leaving the signature are looked up in smaller tables
+    for index in range(size):
+        masks = table_masks(sig, index)
+        if masks is None:
+            continue
+        position = Position(*masks)
+        for side, color in enumerate(colors):
+            inside = 0
+            outcome = LOSS
+            for move in position.moves(color):
+                position.make_move(*move)
+                child = (position.grey, position.blue, position.kings)
+                position.unmake_move()
+                if signature(*child) == sig:
+                    inside += 1
+                    continue
+                value = smaller._probe(*child, colors[1 - side])
+                if value is None:
+                    raise RuntimeError(f"table missing for {signature(*child)}")
+                if value == LOSS:
+                    outcome = WIN
+                    break
+                if value == DRAW:
+                    outcome = DRAW
+            if outcome == WIN or not inside:
+                values[side][index] = outcome
+                if outcome != DRAW:
+                    resolved.append((index, side))
+            else:
+                pending[side][index] = inside
+                draw_option[side][index] = outcome == DRAW
+
+    # Retrograde propagation inside the signature
+    while resolved:
+        index, side = resolved.popleft()
+        lost = values[side][index] == LOSS
+        mover = 1 - side
+        mover_values, mover_pending = values[mover], pending[mover]
+        for previous in _predecessors(sig, *table_masks(sig, index), colors[mover]):
+            if mover_values[previous] or not mover_pending[previous]:
+                continue
+            if lost:
+                mover_values[previous] = WIN
+                resolved.append((previous, mover))
+            else:
+                mover_pending[previous] -= 1
+                if not mover_pending[previous]:
+                    if draw_option[mover][previous]:
+                        mover_values[previous] = DRAW
+                    else:
+                        mover_values[previous] = LOSS
+                        resolved.append((previous, mover))
+
+    # Positions still undecided can avoid losing forever
+    for side in (0, 1):
+        side_values, side_pending = values[side], pending[side]
+        for index in range(size):
+            if not side_values[index] and side_pending[index]:
+                side_values[index] = DRAW
+
+    os.makedirs(directory, exist_ok=True)
+    path = table_path(directory, sig)
+    with open(path + ".tmp", "wb") as out:
+        out.write(HEADER.pack(MAGIC, *sig, size))
+        out.write(zlib.compress(_pack(values[0] + values[1]), 9))
+    os.replace(path + ".tmp", path)
+    return sig, size, time.perf_counter() - start
+
+
+def _solve_task(task):
+    return solve(*task)
+
+
+def generate(pieces, directory=TABLE_DIR, jobs=None):
+    """Generate every missing table with up to pieces pieces."""
+    levels = itertools.groupby(signatures(pieces), key=lambda sig: (sum(sig), sig[0] + sig[2]))
+    with multiprocessing.Pool(jobs) as pool:
+        for (total, pawns), sigs in levels:
+            tasks = [(sig, directory) for sig in sigs if not os.path.exists(table_path(directory, sig))]
+            # Tables of a level only depend on earlier levels
+            for sig, size, seconds in pool.imap_unordered(_solve_task, tasks):
+                print(f"{''.join(map(str, sig))}: {2 * size} positions en {seconds:.1f}s", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tables de finales")
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate_cmd = commands.add_parser("generate", help="calculer les tables manquantes")
+    generate_cmd.add_argument("--pieces", type=int, default=3, help="nombre maximal de pieces")
+    generate_cmd.add_argument("-d", "--directory", default=TABLE_DIR)
+    generate_cmd.add_argument("-j", "--jobs", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    generate(args.pieces, args.directory, args.jobs)
+    print(f"Termine en {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
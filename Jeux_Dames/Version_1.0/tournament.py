@@ -0,0 +1,174 @@
+"""
+Self-play tournament between two engine settings, on every CPU core.
+
+Each game is played headless with rules.Board and finished by
+Board.winner (no piece left, or no legal move), one of the draw rules of
+Board.draw_reason or the ply limit (draw). Colours alternate between
+games, and the first plies are random so that the games differ. Every
+finished game is appended to a JSON Lines file as soon as it ends; the
+summary gives the score of A with a 95% confidence interval, the Elo
+difference, the average game length and the search speed of each worker.
+
+Usage:
+    python tournament.py -n 1000 --a depth=4 --b depth=4,king=250
+    python tournament.py -n 200 --a time=0.1 --b time=0.1,center=10 -j 8 -o results.jsonl
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+
+import rules
+from ai import Engine, DEFAULT_WEIGHTS, WEIGHT_NAMES
+from position import GREY, BLUE, other
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(BASE_DIR, "tournament.jsonl")
+
+
+def parse_settings(text):
+    """'depth=4,time=0.2,king=280' -> keyword arguments for Engine."""
+    settings = {'max_depth': 4, 'time_limit': 10.0, 'tt_bits': 16}
+    weights = dict(zip(WEIGHT_NAMES, DEFAULT_WEIGHTS))
+    for item in filter(None, text.split(',')):
+        name, _, value = item.partition('=')
+        name = name.strip()
+        if name == 'depth':
+            settings['max_depth'] = int(value)
+        elif name == 'time':
+            settings['time_limit'] = float(value)
+        elif name == 'tt':
+            settings['tt_bits'] = int(value)
+        elif name in weights:
+            weights[name] = int(value)
+        else:
+            raise argparse.ArgumentTypeError(f"parametre inconnu: {name}")
+    settings['weights'] = tuple(weights[name] for name in WEIGHT_NAMES)
+    return settings
+
+
+def play_game(task):
+    """Play one game. Runs in a pool worker."""
+    index, a_settings, b_settings, a_color, random_plies, max_plies, seed = task
+    engines = {a_color: Engine(**a_settings), other(a_color): Engine(**b_settings)}
+    rng = random.Random(seed)
+    board = rules.Board()
+    turn = GREY
+    nodes = 0
+    search_time = 0.0
+    result = None
+
+    for ply in range(max_plies):
+        winner = board.winner()
+        if winner:
+            result = GREY if winner == "GRIS" else BLUE
+            break
+        if board.draw_reason():
+            break
+        moves = board.legal_moves()
+        if ply < random_plies:
+            move = rng.choice(moves)
+        else:
+            engine = engines[turn]
+            start = time.perf_counter()
+            move, _, _ = engine.search(board.position, turn)
+            search_time += time.perf_counter() - start
+            nodes += engine.nodes
+        board.make_move(*move)
+        turn = other(turn)
+    else:
+        ply = max_plies
+
+    if result is None:
+        outcome = 'draw'
+    else:
+        outcome = 'A' if result == a_color else 'B'
+    return {
+        'game': index,
+        'a_color': a_color,
+        'result': outcome,
+        'plies': ply,
+        'nodes': nodes,
+        'search_time': round(search_time, 4),
+        'worker': os.getpid(),
+    }
+
+
+def score_interval(wins, draws, losses):
+    """Score of A and its 95% confidence half-width (trinomial model)."""
+    games = wins + draws + losses
+    if not games:
+        return 0.0, 0.0
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    return score, 1.96 * math.sqrt(variance / games)
+
+
+def elo(score):
+    if score <= 0:
+        return float('-inf')
+    if score >= 1:
+        return float('inf')
+    return 400 * math.log10(score / (1 - score))
+
+
+def summarize(results):
+    wins = sum(1 for r in results if r['result'] == 'A')
+    losses = sum(1 for r in results if r['result'] == 'B')
+    draws = len(results) - wins - losses
+    score, margin = score_interval(wins, draws, losses)
+    print(f"Parties: {len(results)}   A: +{wins} ={draws} -{losses}")
+    print(f"Score A: {score:.3f} +/- {margin:.3f} (95%)   "
+          f"Elo: {elo(score):+.0f} [{elo(score - margin):+.0f}, {elo(score + margin):+.0f}]")
+    if results:
+        print(f"Longueur moyenne: {sum(r['plies'] for r in results) / len(results):.1f} demi-coups")
+
+    workers = {}
+    for r in results:
+        nodes, seconds = workers.get(r['worker'], (0, 0.0))
+        workers[r['worker']] = (nodes + r['nodes'], seconds + r['search_time'])
+    for pid, (nodes, seconds) in sorted(workers.items()):
+        speed = nodes / seconds if seconds else 0.0
+        print(f"  worker {pid}: {nodes} noeuds, {speed:.0f} noeuds/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tournoi entre deux reglages du moteur")
+    parser.add_argument("-n", "--games", type=int, default=100)
+    parser.add_argument("--a", type=parse_settings, default=parse_settings(""),
+                        help="reglages du moteur A, ex. depth=4,time=0.2,king=300")
+    parser.add_argument("--b", type=parse_settings, default=parse_settings(""),
+                        help="reglages du moteur B")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("-o", "--output", default=RESULTS_FILE,
+                        help="fichier JSON Lines, une ligne par partie terminee")
+    parser.add_argument("--random-plies", type=int, default=4,
+                        help="demi-coups joues au hasard en debut de partie")
+    parser.add_argument("--max-plies", type=int, default=300,
+                        help="partie nulle au-dela de ce nombre de demi-coups")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    tasks = [(i, args.a, args.b, GREY if i % 2 == 0 else BLUE,
+              args.random_plies, args.max_plies, args.seed * 1000003 + i // 2)
+             for i in range(args.games)]
+
+    results = []
+    start = time.perf_counter()
+    with open(args.output, "w") as out, multiprocessing.Pool(args.jobs) as pool:
+        for result in pool.imap_unordered(play_game, tasks):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            results.append(result)
+    elapsed = time.perf_counter() - start
+
+    summarize(results)
+    print(f"{len(results)} parties en {elapsed:.1f}s avec {args.jobs} processus")
+
+
+if __name__ == '__main__':
+    main()